@@ -1,60 +1,115 @@
 """Bot entry point."""
 
 import asyncio
+import logging
 import os
 import platform
 import random
 from datetime import datetime
+from time import perf_counter
 
 import discord
-from aiohttp import ClientSession
+from aiohttp import ClientSession, web
 from discord.ext import commands, tasks
 from discord.ext.commands import Bot, Context
-from lib.consts import C_ERROR, PREFIX, TOKEN
-
-intents = discord.Intents.default()
-
-intents.members = True
-intents.message_content = True
-intents.presences = True
+from lib.consts import (
+    C_ERROR,
+    LEAN_GATEWAY,
+    MAX_MESSAGES,
+    METRICS_PORT,
+    MONGODB_HOST,
+    PREFIX,
+    TOKEN,
+)
+from lib.db import Database
+from lib.http import HTTPClient, create_session
+from lib.lag import LagMonitor
+from lib.log import setup_logging
+from lib.metrics import metrics, start_metrics_server
+
+log = logging.getLogger("primed")
+
+if LEAN_GATEWAY:
+    # only what commands and dms need, no member or presence caching
+    intents = discord.Intents.none()
+    intents.guilds = True
+    intents.guild_messages = True
+    intents.dm_messages = True
+    intents.message_content = True
+    member_cache_flags = discord.MemberCacheFlags.none()
+else:
+    intents = discord.Intents.default()
+
+    intents.members = True
+    intents.message_content = True
+    intents.presences = True
+    member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
 
 
 class Primed(Bot):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.start_time: datetime = datetime.utcnow()
+        self.ready_time: float | None = None
+        self.db: Database | None = None
+        self.metrics_runner: web.AppRunner | None = None
+        self.lag = LagMonitor()
 
     async def close(self) -> None:
-        """Close the aiohttp session when the bot is closed."""
+        """Close the aiohttp session and database when the bot is closed."""
         await super().close()
+        self.lag.stop()
         await self.session.close()
+        if self.db is not None:
+            await self.db.close()
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
 
     async def setup_hook(self) -> None:
         """Load cogs and start the bot."""
-        self.session: ClientSession = ClientSession(loop=self.loop)
+        self.session: ClientSession = create_session()
+        self.http_client = HTTPClient(self.session)
+        self.lag.start()
+        if MONGODB_HOST is not None:
+            self.db = Database(self)
+            await self.db.create_indexes()
+        if METRICS_PORT is not None:
+            self.metrics_runner = await start_metrics_server(METRICS_PORT)
         await self.load_cogs()
         # await self.tree.sync()
 
-    async def load_cogs(self) -> None:  # noqa: D103
-        for file in os.listdir("./bot/exts"):
-            if file.endswith(".py"):
-                ext = file[:-3]
-                try:
-                    await self.load_extension(f"exts.{ext}")
-                    print(f"'{ext}' loaded")
-                except Exception as e:
-                    exception = f"{type(e).__name__}: {e}"
-                    print(f"Exception on loading {ext}\n{exception}")
+    async def load_cog(self, ext: str) -> None:
+        """Load one extension, logging instead of raising so the others still load."""
+        start = perf_counter()
+        try:
+            await self.load_extension(f"exts.{ext}")
+            log.info("'%s' loaded in %.3fs", ext, perf_counter() - start)
+        except Exception as e:
+            exception = f"{type(e).__name__}: {e}"
+            log.error("Exception on loading %s\n%s", ext, exception)
+
+    async def load_cogs(self) -> None:
+        """Load every extension concurrently, their setup is mostly waiting on io."""
+        exts = [file[:-3] for file in os.listdir("./bot/exts") if file.endswith(".py")]
+        with metrics.time("load_cogs"):
+            await asyncio.gather(*(self.load_cog(ext) for ext in exts))
 
     async def on_ready(self) -> None:
         """Start the status task when the bot is ready."""
-        print("loaded aiohttp session")
-        print("-------------------")
-        print(f"{self.user.name}#{self.user.discriminator}")  # type: ignore
-        print(f"discord.py {discord.__version__}")
-        print(f"Python {platform.python_version()}")
-        print(f"{platform.system()} {platform.release()} ({os.name})")
-        print("-------------------")
+        if self.ready_time is None:
+            self.ready_time = (datetime.utcnow() - self.start_time).total_seconds()
+            metrics.observe("startup", self.ready_time)
+        log.info(
+            "ready in %.2fs as %s#%s, discord.py %s, Python %s, %s %s (%s)",
+            self.ready_time,
+            self.user.name,  # type: ignore
+            self.user.discriminator,  # type: ignore
+            discord.__version__,
+            platform.python_version(),
+            platform.system(),
+            platform.release(),
+            os.name,
+        )
 
     async def on_message(self, message: discord.Message) -> None:
         """Process commands on message."""
@@ -182,5 +237,13 @@ class Primed(Bot):
 
 # asyncio.run(load_cogs())
 
-bot = Primed(command_prefix=commands.when_mentioned_or(PREFIX), intents=intents)
-bot.run(TOKEN)  # type: ignore
+listener = setup_logging()
+bot = Primed(
+    command_prefix=commands.when_mentioned_or(PREFIX),
+    intents=intents,
+    member_cache_flags=member_cache_flags,
+    chunk_guilds_at_startup=not LEAN_GATEWAY,
+    max_messages=MAX_MESSAGES,
+)
+bot.run(TOKEN, log_handler=None)  # type: ignore
+listener.stop()
@@ -1,11 +1,13 @@
 """Developer commands."""
 
+import asyncio
 import os
 
 import discord
 from discord.ext import commands
 from discord.ext.commands import Bot, Context
-from lib.consts import C_ERROR, C_SUCCESS
+from lib import consts
+from lib.metrics import metrics
 
 
 class Admin(commands.Cog, name="admin and dev commands"):
@@ -21,7 +23,7 @@ class Admin(commands.Cog, name="admin and dev commands"):
     @commands.is_owner()
     async def kill(self, ctx: Context) -> None:
         """Close all HTTP sessions and end the bot process."""
-        embed = discord.Embed(description="bot killed by owner", color=C_SUCCESS)
+        embed = discord.Embed(description="bot killed by owner", color=consts.C_SUCCESS)
         await ctx.send(embed=embed)
         await self.bot.close()
 
@@ -35,7 +37,7 @@ class Admin(commands.Cog, name="admin and dev commands"):
             embed = discord.Embed(
                 title="No subcommand provided",
                 description="Please specify a subcommand",
-                color=C_ERROR,
+                color=consts.C_ERROR,
             )
             await ctx.send(embed=embed)
 
@@ -59,13 +61,13 @@ class Admin(commands.Cog, name="admin and dev commands"):
                 embed = discord.Embed(
                     title=f"Exception on loading {ext}",
                     description=f"{exception}",
-                    color=C_ERROR,
+                    color=consts.C_ERROR,
                 )
                 await ctx.send(embed=embed)
                 return
 
             embed = discord.Embed(
-                title="Load", description=f"Loaded `{ext}`", color=C_SUCCESS
+                title="Load", description=f"Loaded `{ext}`", color=consts.C_SUCCESS
             )
             await ctx.send(embed=embed)
 
@@ -89,12 +91,12 @@ class Admin(commands.Cog, name="admin and dev commands"):
                 embed = discord.Embed(
                     title=f"Exception on unloading {ext}",
                     description=f"{exception}",
-                    color=C_ERROR,
+                    color=consts.C_ERROR,
                 )
                 await ctx.send(embed=embed)
                 return
             embed = discord.Embed(
-                title="Unload", description=f"Unloaded `{ext}`", color=C_SUCCESS
+                title="Unload", description=f"Unloaded `{ext}`", color=consts.C_SUCCESS
             )
             await ctx.send(embed=embed)
 
@@ -104,29 +106,63 @@ class Admin(commands.Cog, name="admin and dev commands"):
     )
     @commands.is_owner()
     async def reload(self, ctx: Context, *exts: str) -> None:
-        """Reload extensions."""
+        """Reload extensions, all at once since their setup is mostly waiting on io."""
         if len(exts) == 1 and exts[0] == "*":
             exts = tuple(
                 ext[:-3] for ext in os.listdir("./bot/exts") if ext.endswith(".py")
             )
 
-        for ext in exts:
-            try:
-                await self.bot.reload_extension(f"exts.{ext}")
-            except Exception as e:
-                exception = f"{type(e).__name__}: {e}"
+        results = await asyncio.gather(
+            *(self.bot.reload_extension(f"exts.{ext}") for ext in exts),
+            return_exceptions=True,
+        )
+        reloaded = []
+        for ext, result in zip(exts, results):
+            if isinstance(result, Exception):
+                exception = f"{type(result).__name__}: {result}"
                 embed = discord.Embed(
                     title=f"Exception on reloading {ext}",
                     description=f"{exception}",
-                    color=C_ERROR,
+                    color=consts.C_ERROR,
                 )
                 await ctx.send(embed=embed)
-                return
+            else:
+                reloaded.append(f"`{ext}`")
+        if reloaded:
             embed = discord.Embed(
-                title="Reload", description=f"Reloaded `{ext}`", color=C_SUCCESS
+                title="Reload",
+                description=f"Reloaded {', '.join(reloaded)}",
+                color=consts.C_SUCCESS,
             )
             await ctx.send(embed=embed)
 
+    @commands.command(
+        name="metrics",
+        description="scrape pipeline metrics",
+    )
+    @commands.is_owner()
+    async def show_metrics(self, ctx: Context) -> None:
+        """Show recent stage timings and pipeline counters."""
+        embed = discord.Embed(title="Metrics", color=consts.C_NEUTRAL)
+        for stage, samples in metrics.timings.items():
+            embed.add_field(
+                name=stage,
+                value=f"`p50 {metrics.percentile(stage, 0.5) * 1000:.1f}ms`\n"
+                f"`p90 {metrics.percentile(stage, 0.9) * 1000:.1f}ms`\n"
+                f"`p99 {metrics.percentile(stage, 0.99) * 1000:.1f}ms`\n"
+                f"`n {len(samples)}`",
+            )
+        if metrics.counters:
+            embed.add_field(
+                name="counters",
+                value="\n".join(
+                    f"`{counter}: {value}`"
+                    for counter, value in metrics.counters.items()
+                ),
+                inline=False,
+            )
+        await ctx.send(embed=embed)
+
 
 async def setup(bot):  # noqa: D103
     await bot.add_cog(Admin(bot))
@@ -5,7 +5,8 @@ from datetime import datetime
 import discord
 from discord.ext import commands
 from discord.ext.commands import Bot, Context
-from lib.consts import C_NEUTRAL, INVITE
+from lib import consts
+from lib.metrics import metrics
 
 
 class General(commands.Cog, name="general commands"):
@@ -20,10 +21,13 @@ class General(commands.Cog, name="general commands"):
     )
     async def ping(self, ctx: Context) -> None:
         """Check bot latency."""
+        lag = self.bot.lag  # type: ignore
         embed = discord.Embed(
             title="Still alive!",
-            description=f"Latency: {round(self.bot.latency * 1000, 3)}ms.",
-            color=C_NEUTRAL,
+            description=f"Latency: {round(self.bot.latency * 1000, 3)}ms.\n"
+            f"Loop lag: {round(lag.current * 1000, 3)}ms"
+            f" (peak {round(lag.peak * 1000, 3)}ms).",
+            color=consts.C_NEUTRAL,
         )
         await ctx.send(embed=embed)
 
@@ -34,8 +38,8 @@ class General(commands.Cog, name="general commands"):
     async def invite(self, ctx: Context) -> None:
         """Send invite link to user."""
         embed = discord.Embed(
-            description=f"Invite me by clicking [here]({INVITE}).",
-            color=C_NEUTRAL,
+            description=f"Invite me by clicking [here]({consts.INVITE}).",
+            color=consts.C_NEUTRAL,
         )
         try:
             await ctx.author.send(embed=embed)
@@ -48,7 +52,7 @@ class General(commands.Cog, name="general commands"):
     )
     async def uptime(self, ctx: Context) -> None:
         """Get uptime info and status check."""
-        embed = discord.Embed(title="Status", color=C_NEUTRAL)
+        embed = discord.Embed(title="Status", color=consts.C_NEUTRAL)
         embed.add_field(
             name="Uptime",
             value=f"`{str(datetime.utcnow() - self.bot.start_time)}`",  # type: ignore
@@ -59,6 +63,30 @@ class General(commands.Cog, name="general commands"):
             value=f"`{str(self.bot.start_time)}`",  # type: ignore
             inline=False,
         )
+        if self.bot.ready_time is not None:  # type: ignore
+            embed.add_field(
+                name="Time to ready",
+                value=f"`{self.bot.ready_time:.2f}s`",  # type: ignore
+                inline=False,
+            )
+        lag = self.bot.lag  # type: ignore
+        embed.add_field(
+            name="Event loop lag",
+            value=f"`now {lag.current * 1000:.1f}ms,"
+            f" p99 {metrics.percentile('loop_lag', 0.99) * 1000:.1f}ms,"
+            f" peak {lag.peak * 1000:.1f}ms`",
+            inline=False,
+        )
+        scraper = self.bot.get_cog("scraper commands")
+        if scraper is not None:
+            scheduler = scraper.scheduler  # type: ignore
+            embed.add_field(
+                name="Polling",
+                value=f"`every {scheduler.interval:.0f}s"
+                f" ({scheduler.min_interval}-{scheduler.max_interval}s),"
+                f" {scheduler.unchanged} unchanged cycle(s)`",
+                inline=False,
+            )
         await ctx.send(embed=embed)
 
     @commands.hybrid_command(
@@ -80,7 +108,7 @@ class General(commands.Cog, name="general commands"):
     )
     async def about(self, ctx: Context) -> None:
         """About info."""
-        embed = discord.Embed(title="About", color=C_NEUTRAL)
+        embed = discord.Embed(title="About", color=consts.C_NEUTRAL)
         embed.description = (
             "Primed is a bot that notifies changes in stats and sets on hsqb."
         )
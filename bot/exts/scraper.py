@@ -1,20 +1,60 @@
 """Scrape data of newly posted stats and sets from the front page of hsqb."""
 
+import asyncio
+import hashlib
+import logging
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple, Type, TypeVar
 
 import aiohttp
 import discord
-from bs4 import BeautifulSoup
 from discord.ext import commands, tasks
 from discord.ext.commands import Bot, Context
-from lib.consts import C_NEUTRAL, HSQB, INVITE
+from lib import consts
+from lib.consts import HSQB
+from lib.db import SeenItems, database_errors
+from lib.http import CircuitOpenError
+from lib.ipc import subscribe
+from lib.metrics import metrics
+from lib.notify import Notifier, Outbox
+from lib.parse import (
+    SETS_ID,
+    STATS_ID,
+    SetRow,
+    TournamentRow,
+    extract_page,
+    extract_sets,
+    extract_stats,
+    section_html,
+)
+from lib.poll import PollScheduler
 
+log = logging.getLogger(__name__)
+
+
+class Frozen:
+    """Base class for immutable, slotted scrape models."""
+
+    __slots__ = ()
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+class StatReport(Frozen):
+    __slots__ = ("name", "link")
+
+    name: str
+    link: str
 
-class StatReport:
     def __init__(self, name: str, link: str):
-        self.name: str = name
-        self.link: str = link
+        object.__setattr__(self, "name", sys.intern(name))
+        object.__setattr__(self, "link", sys.intern(link))
 
     def __eq__(self, __value: object) -> bool:
         if not isinstance(__value, StatReport):
@@ -22,17 +62,26 @@ class StatReport:
 
         return self.name == __value.name and self.link == __value.link
 
+    def __hash__(self) -> int:
+        return hash(self.link)
+
+
+class TournamentStats(Frozen):
+    __slots__ = ("tournament_name", "tournament_link", "stat_reports")
+
+    tournament_name: str
+    tournament_link: str
+    stat_reports: Tuple[StatReport, ...]
 
-class TournamentStats:
     def __init__(
         self,
         tournament_name: str,
         tournament_link: str,
-        stat_reports: List[StatReport],
+        stat_reports: Iterable[StatReport],
     ):
-        self.tournament_name: str = tournament_name
-        self.tournament_link: str = tournament_link
-        self.stat_reports: List[StatReport] = stat_reports
+        object.__setattr__(self, "tournament_name", sys.intern(tournament_name))
+        object.__setattr__(self, "tournament_link", sys.intern(tournament_link))
+        object.__setattr__(self, "stat_reports", tuple(stat_reports))
 
     def __str__(self):
         return (
@@ -51,11 +100,19 @@ class TournamentStats:
             and self.stat_reports == __value.stat_reports
         )
 
+    def __hash__(self) -> int:
+        return hash(self.tournament_link)
+
+
+class Set(Frozen):
+    __slots__ = ("name", "link")
+
+    name: str
+    link: str
 
-class Set:
     def __init__(self, name: str, link: str):
-        self.name: str = name
-        self.link: str = link
+        object.__setattr__(self, "name", sys.intern(name))
+        object.__setattr__(self, "link", sys.intern(link))
 
     def __str__(self):
         return f"{self.name} ({self.link})"
@@ -66,14 +123,44 @@ class Set:
 
         return self.name == __value.name and self.link == __value.link
 
+    def __hash__(self) -> int:
+        return hash(self.link)
+
+
+class Scrape(Frozen):
+    __slots__ = ("stats", "sets", "timestamp")
+
+    stats: Tuple[TournamentStats, ...]
+    sets: Tuple[Set, ...]
+    timestamp: datetime
 
-class Scrape:
     def __init__(
-        self, stats: List[TournamentStats], sets: List[Set], timestamp: datetime
+        self,
+        stats: Iterable[TournamentStats],
+        sets: Iterable[Set],
+        timestamp: datetime,
     ):
-        self.stats: List[TournamentStats] = stats
-        self.sets: List[Set] = sets
-        self.timestamp: datetime = timestamp
+        object.__setattr__(self, "stats", tuple(stats))
+        object.__setattr__(self, "sets", tuple(sets))
+        object.__setattr__(self, "timestamp", timestamp)
+
+
+# items from previous scrapes, so unchanged items reuse the same objects every cycle
+interned_items: Dict[tuple, Frozen] = {}
+MAX_INTERNED = 4096
+
+F = TypeVar("F", bound=Frozen)
+
+
+def interned(cls: Type[F], *args) -> F:
+    """Get the shared instance of a scrape model, creating it if it hasn't been seen."""
+    key = (cls, *args)
+    item = interned_items.get(key)
+    if item is None:
+        if len(interned_items) >= MAX_INTERNED:
+            interned_items.clear()
+        item = interned_items[key] = cls(*args)
+    return item  # type: ignore
 
 
 class Scraper(commands.Cog, name="scraper commands"):
@@ -84,115 +171,497 @@ class Scraper(commands.Cog, name="scraper commands"):
     cache: Scrape | None = None
     scrape_cycle: int = 0
 
+    etag: str | None = None
+    last_modified: str | None = None
+    page_hash: bytes | None = None
+    page_size: int = 0
+    section_hashes: Dict[str, bytes | None]
+
     def __init__(self, bot: Bot):
         self.bot = bot
         self.scrape_cycle = 0
+        self.section_hashes = {}
+        self.seen = SeenItems(bot.db)  # type: ignore
+        self.database_errors = database_errors(bot.db)  # type: ignore
+        self.notifier = Notifier(bot)
+        self.scheduler = PollScheduler()
+        self.scrape.change_interval(seconds=self.scheduler.interval)
+        self.watch_task: asyncio.Task | None = None
+        self.outbox: Outbox | None = (
+            Outbox(bot.db, self.notifier, self.render_item)  # type: ignore
+            if bot.db is not None  # type: ignore
+            else None
+        )
+        self.outbox_task: asyncio.Task | None = None
+        self.executor: Executor = (
+            ProcessPoolExecutor(consts.PARSE_WORKERS)
+            if consts.PARSE_PROCESSES
+            else ThreadPoolExecutor(consts.PARSE_WORKERS, thread_name_prefix="parse")
+        )
 
-    async def get_page(self) -> Tuple[BeautifulSoup, datetime]:
-        """Get HTML page from the front page of hsqb."""
+    async def cog_load(self) -> None:
+        """Warm load seen items and subscribers so the first scrape can notify."""
+        await self.seen.load()
+        log.info("loaded %d seen items", len(self.seen))
+        self.scheduler.seed(await self.seen.detected_times())
+        await self.start_delivery()
+
+    async def start_delivery(self) -> None:
+        """Load subscribers and deliver the outbox, resuming what the last run left."""
+        if self.bot.db is not None:  # type: ignore
+            await self.bot.db.load_subscribers()  # type: ignore
+            log.info("loaded %d subscribers", len(self.bot.db.subscribers))  # type: ignore
+            self.watch_task = asyncio.create_task(self.bot.db.watch_subscribers())  # type: ignore
+        if self.outbox is not None:
+            self.outbox_task = asyncio.create_task(self.outbox.run())
+
+    async def cog_unload(self) -> None:
+        if self.watch_task is not None:
+            self.watch_task.cancel()
+        if self.outbox_task is not None:
+            self.outbox_task.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def get_page(self) -> Tuple[str | None, datetime]:
+        """Get HTML page from the front page of hsqb.
+
+        Returns `None` in place of the page if it has not changed since the last fetch,
+        either because the server answered 304 or because the body hashes the same.
+        """
         if self.mock_webpage:
             with open("webpages/sample.html") as f:
-                return BeautifulSoup(f.read(), "html.parser"), datetime.utcnow()
-        async with self.bot.session.get(HSQB) as response:  # type: ignore
-            return (
-                BeautifulSoup(await response.text(), "html.parser"),
-                datetime.utcnow(),
-            )
+                return self.check_page(f.read()), datetime.utcnow()
+
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+
+        response = await self.bot.http_client.get(HSQB, headers=headers)  # type: ignore
+        if response.status == 304:
+            metrics.incr("bytes_saved", self.page_size)
+            metrics.incr("parses_skipped")
+            return None, datetime.utcnow()
+
+        self.etag = response.headers.get("ETag")
+        self.last_modified = response.headers.get("Last-Modified")
+        return self.check_page(response.text), datetime.utcnow()
+
+    def check_page(self, html: str) -> str | None:
+        """Return the page if its body hash differs from the last one, else `None`."""
+        body = html.encode()
+        page_hash = hashlib.sha256(body).digest()
+        self.page_size = len(body)
+        metrics.incr("bytes_fetched", self.page_size)
+        if page_hash == self.page_hash:
+            metrics.incr("parses_skipped")
+            return None
+        self.page_hash = page_hash
+        return html
+
+    def forget_page(self) -> None:
+        """Forget the last page so the next cycle fetches and parses it again.
+
+        Called when a cycle ends without committing its parse, otherwise the server's
+        304 or the unchanged body hash would skip that page until hsqb changes.
+        """
+        self.etag = None
+        self.last_modified = None
+        self.page_hash = None
+
+    async def run_parser(self, extract: Callable[[str], Any], html: str) -> Any:
+        """Run an extraction function in the parse executor, off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(
+            loop.run_in_executor(self.executor, extract, html), consts.PARSE_TIMEOUT
+        )
 
-    async def parse_page(self, soup: BeautifulSoup, timestamp: datetime) -> Scrape:
-        """Parse BeautifulSoup into a list of stats and sets."""
-        stats_div = soup.find(id="RecentStats")
-        tournaments = stats_div.find("ul", class_="Tournaments").find_all(  # type: ignore
-            "li", recursive=False
+    async def parse_page(self, html: str, timestamp: datetime) -> Scrape:
+        """Parse HTML page into a list of stats and sets."""
+        stats, sets = await self.run_parser(extract_page, html)
+        return Scrape(
+            stats=self.build_stats(stats),
+            sets=self.build_sets(sets),
+            timestamp=timestamp,
         )
-        scraped_stats: List[TournamentStats] = []
 
-        for tournament in tournaments:
-            tournament_name: str = str(
-                tournament.find("span", class_="Tournament").find("a").string
-            )
-            tournament_link: str = HSQB + str(
-                tournament.find("span", class_="Tournament").find("a")["href"]
-            )
-            stat_reports = [
-                StatReport(
-                    name=str(report.find("a").string),
-                    link=HSQB + str(report.find("a")["href"]),
+    async def parse_sections(
+        self,
+        html: str,
+        sections: Dict[str, str | None],
+        changed: set[str],
+        timestamp: datetime,
+    ) -> Scrape:
+        """Parse only the changed sections, reusing the cached scrape for the rest.
+
+        Falls back to parsing the whole page if a section doesn't look like we expect,
+        e.g. when it was sliced out of the page wrong.
+        """
+        assert self.cache is not None
+        stats = self.cache.stats
+        sets = self.cache.sets
+
+        try:
+            if STATS_ID in changed:
+                stats = self.build_stats(
+                    await self.run_parser(extract_stats, sections[STATS_ID])  # type: ignore
                 )
-                for report in tournament.find("ul", class_="Reports").find_all("li")
-            ]
-            scraped_stats.append(
-                TournamentStats(
-                    tournament_name=tournament_name,
-                    tournament_link=tournament_link,
-                    stat_reports=stat_reports,
+            if SETS_ID in changed:
+                sets = self.build_sets(
+                    await self.run_parser(extract_sets, sections[SETS_ID])  # type: ignore
                 )
+        except (AttributeError, KeyError, TypeError):
+            log.warning("unexpected section markup, falling back to full parse")
+            return await self.parse_page(html, timestamp)
+
+        return Scrape(stats=stats, sets=sets, timestamp=timestamp)
+
+    def fingerprint_sections(
+        self, sections: Dict[str, str | None]
+    ) -> Dict[str, bytes | None]:
+        """Hash the raw HTML of each section, `None` if the section wasn't found."""
+        return {
+            section_id: hashlib.sha256(html.encode()).digest() if html else None
+            for section_id, html in sections.items()
+        }
+
+    def build_stats(self, rows: Iterable[TournamentRow]) -> List[TournamentStats]:
+        """Turn extracted tournament rows into interned tournament stats."""
+        return [
+            interned(
+                TournamentStats,
+                tournament_name,
+                tournament_link,
+                tuple(interned(StatReport, *report) for report in stat_reports),
             )
+            for tournament_name, tournament_link, stat_reports in rows
+        ]
+
+    def build_sets(self, rows: Iterable[SetRow]) -> List[Set]:
+        """Turn extracted set rows into interned sets."""
+        return [interned(Set, *row) for row in rows]
+
+    async def get_new(
+        self, new_scrape: Scrape, stats: bool = True, sets: bool = True
+    ) -> Scrape | None:
+        """Get new stats from a new scrape, only diffing the sections asked for.
+
+        Items are matched by link against every item seen before, including before a
+        restart. Known tournaments are returned with only their newly added reports, or
+        left out if none were added.
+        """
+        if self.cache is None and not self.seen:
+            return None  # return None if nothing has been seen, first scrape will be used as cache
+
+        new_stats: List[TournamentStats] = []
+        if stats:
+            for tournament in new_scrape.stats:
+                if tournament.tournament_link not in self.seen:
+                    new_stats.append(tournament)
+                    continue
+                stat_reports = [
+                    sr for sr in tournament.stat_reports if sr.link not in self.seen
+                ]
+                if stat_reports:
+                    new_stats.append(
+                        TournamentStats(
+                            tournament_name=tournament.tournament_name,
+                            tournament_link=tournament.tournament_link,
+                            stat_reports=stat_reports,
+                        )
+                    )
+
+        new_sets: List[Set] = []
+        if sets:
+            new_sets = [set for set in new_scrape.sets if set.link not in self.seen]
+
+        return Scrape(stats=new_stats, sets=new_sets, timestamp=new_scrape.timestamp)
+
+    def scrape_links(self, scrape: Scrape) -> Iterator[str]:
+        """Iterate over the links of every tournament, stat report and set in a scrape."""
+        for tournament in scrape.stats:
+            yield tournament.tournament_link
+            for sr in tournament.stat_reports:
+                yield sr.link
+        for set in scrape.sets:
+            yield set.link
+
+    def dump_scrape(self, scrape: Scrape) -> Dict[str, Any]:
+        """Serialize a scrape as the rows the parser extracts, to pass between processes."""
+        return {
+            "stats": [
+                [
+                    tournament.tournament_name,
+                    tournament.tournament_link,
+                    [[sr.name, sr.link] for sr in tournament.stat_reports],
+                ]
+                for tournament in scrape.stats
+            ],
+            "sets": [[set.name, set.link] for set in scrape.sets],
+            "timestamp": scrape.timestamp.isoformat(),
+        }
 
-        sets_div = soup.find(id="RecentlyPostedSets")
-        sets = sets_div.find("ul", class_="NoHeader").find_all(  # type: ignore
-            "li", recursive=False
+    def load_scrape(self, data: Dict[str, Any]) -> Scrape:
+        """Rebuild a scrape serialized by `dump_scrape`."""
+        return Scrape(
+            stats=self.build_stats(data["stats"]),
+            sets=self.build_sets(data["sets"]),
+            timestamp=datetime.fromisoformat(data["timestamp"]),
         )
-        scraped_sets: List[Set] = []
-
-        for set in sets:
-            set_name: str = str(set.find("span", class_="Name").find("a").string)
-            set_link: str = HSQB + str(
-                set.find("span", class_="Name").find("a")["href"]
-            )
-            scraped_sets.append(Set(name=set_name, link=set_link))
 
-        return Scrape(stats=scraped_stats, sets=scraped_sets, timestamp=timestamp)
+    def log_new(self, new_data: Scrape) -> None:
+        for stat in new_data.stats:
+            log.info("new stats: %s", stat)
+        for set in new_data.sets:
+            log.info("new set: %s", set)
+
+    def stats_embed(self, tournament: TournamentStats) -> discord.Embed:
+        """Build the notification embed for newly posted stats."""
+        return discord.Embed(
+            title=f"New stats for {tournament.tournament_name}",
+            url=tournament.tournament_link,
+            description="\n".join(
+                f"[{sr.name}]({sr.link})" for sr in tournament.stat_reports
+            ),
+            color=consts.C_NEUTRAL,
+        )
 
-    async def get_new(self, new_scrape: Scrape) -> Scrape | None:
-        """Get new stats from a new scrape."""
-        if self.cache is None:
-            return None  # return None if there is no cache, first scrape will be used as cache
-        return Scrape(
-            stats=[
-                tournament
-                for tournament in new_scrape.stats
-                if tournament not in self.cache.stats
-            ],
-            sets=[set for set in new_scrape.sets if set not in self.cache.sets],
-            timestamp=new_scrape.timestamp,
+    def set_embed(self, set: Set) -> discord.Embed:
+        """Build the notification embed for a newly posted set."""
+        return discord.Embed(
+            title=f"New set: {set.name}", url=set.link, color=consts.C_NEUTRAL
         )
 
-    @tasks.loop(seconds=20)
+    def item_key(self, item: Dict[str, Any]) -> str:
+        """Key of an outbox item, its link plus a hash of the reports for stats."""
+        if "set" in item:
+            return item["set"][1]
+        _, link, stat_reports = item["stats"]
+        reports = "\n".join(report_link for _, report_link in stat_reports)
+        return link + "#" + hashlib.sha1(reports.encode()).hexdigest()
+
+    def render_item(self, item: Dict[str, Any]) -> discord.Embed:
+        """Build the embed of an outbox item."""
+        if "set" in item:
+            return self.set_embed(self.build_sets([item["set"]])[0])
+        return self.stats_embed(self.build_stats([item["stats"]])[0])
+
+    async def notify(self, new_data: Scrape) -> None:
+        """Queue newly posted stats and sets in the outbox for every subscribed user."""
+        if self.outbox is None:
+            log.warning("no database, skipping notifications")
+            return
+
+        subscribers = await self.bot.db.get_subscribers()  # type: ignore
+        rows = self.dump_scrape(new_data)
+        items = [({"stats": row}, subscribers.stats) for row in rows["stats"]] + [
+            ({"set": row}, subscribers.sets) for row in rows["sets"]
+        ]
+        keyed = [
+            (self.item_key(item), item, channel_ids) for item, channel_ids in items
+        ]
+        for key, item, _ in keyed:
+            self.outbox.cache.embed(key, item)  # render once here for every recipient
+        # the channel id and item key together are the entry's idempotency key
+        entries = [
+            {
+                "_id": f"{dm_channel_id}:{key}",
+                "key": key,
+                "channel_id": dm_channel_id,
+                "item": item,
+                "detected": new_data.timestamp,
+                "digest": dm_channel_id in subscribers.digest,
+            }
+            for key, item, channel_ids in keyed
+            for dm_channel_id in channel_ids
+        ]
+        queued = await self.bot.db.enqueue_notifications(entries)  # type: ignore
+        log.info("queued %d/%d notifications", queued, len(entries))
+        self.outbox.wake()
+
+    @tasks.loop()  # the interval is set by the poll scheduler
     async def scrape(self) -> None:
         """Scrape data."""
-        print("attempting to scrape")
-        soup, timestamp = await self.get_page()
-        scraped_data = await self.parse_page(soup, timestamp)
-        stats = scraped_data.stats
-        sets = scraped_data.sets
-        for stat in stats:
-            print(stat)
-        for set in sets:
-            print(set)
-        print(scraped_data.timestamp.strftime("%Y-%m-%d %H:%M:%S"))
-        print("scrape complete")
-
-        new_data = await self.get_new(scraped_data)  # newly posted stats and sets
+        log.debug("attempting to scrape")
+        try:
+            with metrics.time("fetch"):
+                html, timestamp = await self.get_page()
+        except (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError) as e:
+            log.warning("could not fetch hsqb: %s", e)
+            metrics.incr("fetch_errors")
+            await self.end_cycle()
+            return
+        if html is None:
+            log.debug(
+                "page unchanged, skipping parse (bytes saved: %d, parses skipped: %d)",
+                metrics.counters["bytes_saved"],
+                metrics.counters["parses_skipped"],
+            )
+            await self.end_cycle()
+            return
+
+        sections = {
+            STATS_ID: section_html(html, STATS_ID),
+            SETS_ID: section_html(html, SETS_ID),
+        }
+        section_hashes = self.fingerprint_sections(sections)
+        changed = {
+            section_id
+            for section_id, section_hash in section_hashes.items()
+            if section_hash is None
+            or section_hash != self.section_hashes.get(section_id)
+        }
+        if self.cache is not None and not changed:
+            log.debug("sections unchanged, skipping parse")
+            metrics.incr("parses_skipped")
+            await self.end_cycle()
+            return
+
+        try:
+            with metrics.time("parse"):
+                if self.cache is None or None in section_hashes.values():
+                    changed = {STATS_ID, SETS_ID}
+                    scraped_data = await self.parse_page(html, timestamp)
+                else:
+                    scraped_data = await self.parse_sections(
+                        html, sections, changed, timestamp
+                    )
+        except asyncio.TimeoutError:
+            log.warning(
+                "parse timed out after %ss, retrying next cycle", consts.PARSE_TIMEOUT
+            )
+            metrics.incr("parse_timeouts")
+            self.forget_page()
+            await self.end_cycle()
+            return
+        if log.isEnabledFor(logging.DEBUG):
+            for stat in scraped_data.stats:
+                log.debug("%s", stat)
+            for set in scraped_data.sets:
+                log.debug("%s", set)
+            log.debug("scrape complete at %s", scraped_data.timestamp)
+
+        with metrics.time("diff"):
+            new_data = await self.get_new(  # newly posted stats and sets
+                scraped_data, stats=STATS_ID in changed, sets=SETS_ID in changed
+            )
         if new_data is None:
-            print("no cache, setting cache")
+            log.info("no cache, setting cache")
 
+        new_items = 0
         if new_data is not None:
-            if len(new_data.stats) == 0 and len(new_data.sets) == 0:
-                print("no new data")
+            new_items = len(new_data.sets) + sum(
+                len(tournament.stat_reports) for tournament in new_data.stats
+            )
+            metrics.incr("new_items", new_items)
+            if new_items == 0:
+                log.debug("no new data")
 
             else:
-                pass
-
+                self.log_new(new_data)
+
+        try:
+            if new_items:
+                with metrics.time("notify"):
+                    await self.notify(new_data)  # type: ignore
+            await self.seen.add(self.scrape_links(scraped_data))
+        except self.database_errors as e:
+            # nothing is committed, the next cycle diffs this page again and items
+            # already in the outbox aren't queued twice
+            log.warning("could not queue new items, retrying next cycle: %s", e)
+            metrics.incr("db_errors")
+            self.forget_page()
+            await self.end_cycle()
+            return
         self.cache = scraped_data
+        self.section_hashes = section_hashes
+        await self.end_cycle(changed=True, new_items=new_items)
+
+    async def end_cycle(self, changed: bool = False, new_items: int = 0) -> None:
+        """Advance the scrape cycle, schedule the next one and update the bot presence."""
+        delay = self.scheduler.record(changed, new_items)
+        self.scrape.change_interval(seconds=delay)
+        log.debug("next scrape in %.1fs", delay)
         self.scrape_cycle += 1
+        await self.update_presence()
+
+    async def update_presence(self) -> None:
         await self.bot.change_presence(activity=discord.Game(f"/help | @ cycle #{self.scrape_cycle}"))  # type: ignore
 
+    @scrape.error
+    async def scrape_error(self, error: BaseException) -> None:
+        metrics.incr("scrape_errors")
+        log.error("scrape loop stopped by an exception", exc_info=error)
+
     @commands.Cog.listener()
     async def on_ready(self) -> None:
-        print("starting scrape loop")
+        log.info("starting scrape loop")
         self.scrape.start()
 
 
+class ScrapeRelay(Scraper):
+    """Deliver diffs published by a separate scrape worker process.
+
+    Loaded instead of `Scraper` when `ipc.socket` is set. The worker (`bot/worker.py`)
+    fetches and parses the page, so parsing can't starve the gateway and either process
+    can restart without the other.
+    """
+
+    def __init__(self, bot: Bot, path: str | None = None):
+        super().__init__(bot)
+        self.path = consts.IPC_SOCKET if path is None else path
+        self.relay_task: asyncio.Task | None = None
+
+    async def cog_load(self) -> None:
+        await self.start_delivery()
+        self.relay_task = asyncio.create_task(self.relay())
+
+    async def cog_unload(self) -> None:
+        if self.relay_task is not None:
+            self.relay_task.cancel()
+        await super().cog_unload()
+
+    async def relay(self, retry: float = 1.0, max_retry: float = 30.0) -> None:
+        """Notify subscribers of every diff the worker publishes.
+
+        The worker has already marked a diff's items seen, so a diff is only moved past
+        once it's in the outbox, database errors are retried with backoff until then.
+        """
+        async for message in subscribe(self.path):
+            try:
+                new_data = self.load_scrape(message)
+            except Exception:
+                metrics.incr("relay_errors")
+                log.exception("could not read diff from the scrape worker")
+                continue
+            new_items = len(new_data.sets) + sum(
+                len(tournament.stat_reports) for tournament in new_data.stats
+            )
+            metrics.incr("new_items", new_items)
+            self.log_new(new_data)
+            delay = retry
+            while True:
+                try:
+                    with metrics.time("notify"):
+                        await self.notify(new_data)
+                    break
+                except self.database_errors as e:
+                    metrics.incr("db_errors")
+                    log.warning("database error, retrying diff in %.0fs: %s", delay, e)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, max_retry)
+                except Exception:
+                    metrics.incr("relay_errors")
+                    log.exception("could not relay diff from the scrape worker")
+                    break
+
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        log.info("relaying diffs from the scrape worker on %s", self.path)
+
+
 async def setup(bot):  # noqa: D103
-    await bot.add_cog(Scraper(bot))
+    await bot.add_cog(
+        ScrapeRelay(bot) if consts.IPC_SOCKET is not None else Scraper(bot)
+    )
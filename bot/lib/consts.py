@@ -1,53 +1,137 @@
-"""Constants and aliases."""
+"""Constants and aliases.
+
+Importing this module has no side effects. Values that come from the environment or
+`config.json` are loaded the first time one of them is imported, then cached.
+"""
 
 import os
+from functools import cache
 from json import load
+from typing import Any, Callable
 
-try:
-    from dotenv import load_dotenv
-
-    load_dotenv()
-
-except ImportError:
-    if os.path.exists(".env"):
-        print(
-            ".env file found but dotenv is not installed, please install the dev dependencies with 'poetry install'"  # noqa: E501
-        )
-        exit(1)
-
-
-CLIENT_ID = os.getenv("CLIENT_ID")
-INVITE = f"https://discord.com/api/oauth2/authorize?client_id={CLIENT_ID}&permissions=8&scope=bot"
+CONFIG_PATH = "config.json"
 
-TOKEN = os.getenv("TOKEN")
+HSQB = "https://hsquizbowl.org/db/"
 
-if TOKEN is None:
-    print(
-        "no token found, please add a token to a .env file or set the TOKEN environment variable"
-    )
-    exit(1)
+# local store of seen item links, used when mongodb isn't configured
+SEEN_PATH = "seen.db"
 
-CONFIG_PATH = "config.json"
 
-if not os.path.exists(CONFIG_PATH):
-    with open(CONFIG_PATH, "w") as f:
-        with open("config_default.json") as default:
-            f.write(default.read())
+@cache
+def load_env() -> None:
+    try:
+        from dotenv import load_dotenv
 
-with open(CONFIG_PATH) as f:
-    config = load(f)
+        load_dotenv()
 
-PREFIX = config["prefix"]
-C_NEUTRAL = int(config["embed_colors"]["neutral"], 16)
-C_ERROR = int(config["embed_colors"]["error"], 16)
-C_SUCCESS = int(config["embed_colors"]["success"], 16)
+    except ImportError:
+        if os.path.exists(".env"):
+            print(
+                ".env file found but dotenv is not installed, please install the dev dependencies with 'poetry install'"  # noqa: E501
+            )
+            exit(1)
 
-HSQB = "https://hsquizbowl.org/db/"
 
-# mongodb
+def getenv(key: str) -> str | None:
+    load_env()
+    return os.getenv(key)
 
-MONGODB_HOST = os.getenv("MONGODB_HOST")
-MONGODB_USERNAME = os.getenv("MONGODB_USERNAME")
-MONGODB_PASSWORD = os.getenv("MONGODB_PASSWORD")
 
-MONGODB_URI = f"mongodb+srv://{MONGODB_USERNAME}:{MONGODB_PASSWORD}@{MONGODB_HOST}/?retryWrites=true&w=majority"  # noqa: E501
+def get_token() -> str:
+    token = getenv("TOKEN")
+    if token is None:
+        print(
+            "no token found, please add a token to a .env file or set the TOKEN environment variable"  # noqa: E501
+        )
+        exit(1)
+    return token
+
+
+@cache
+def load_config() -> dict:
+    if not os.path.exists(CONFIG_PATH):
+        with open(CONFIG_PATH, "w") as f:
+            with open("config_default.json") as default:
+                f.write(default.read())
+
+    with open(CONFIG_PATH) as f:
+        return load(f)
+
+
+def option(section: str, key: str, default: Any) -> Any:
+    """Read an optional config value, older config files may not have it."""
+    return load_config().get(section, {}).get(key, default)
+
+
+def mongodb_uri() -> str:
+    host = getenv("MONGODB_HOST")
+    username = getenv("MONGODB_USERNAME")
+    password = getenv("MONGODB_PASSWORD")
+    return f"mongodb+srv://{username}:{password}@{host}/?retryWrites=true&w=majority"
+
+
+lazy: dict[str, Callable[[], Any]] = {
+    "CLIENT_ID": lambda: getenv("CLIENT_ID"),
+    "INVITE": lambda: f"https://discord.com/api/oauth2/authorize?client_id={getenv('CLIENT_ID')}&permissions=8&scope=bot",  # noqa: E501
+    "TOKEN": get_token,
+    "PREFIX": lambda: load_config()["prefix"],
+    "C_NEUTRAL": lambda: int(load_config()["embed_colors"]["neutral"], 16),
+    "C_ERROR": lambda: int(load_config()["embed_colors"]["error"], 16),
+    "C_SUCCESS": lambda: int(load_config()["embed_colors"]["success"], 16),
+    # gateway footprint, lean mode drops member/presence intents and caching
+    "LEAN_GATEWAY": lambda: option("gateway", "lean", True),
+    "MAX_MESSAGES": lambda: option("gateway", "max_messages", 100),
+    # notifications
+    "NOTIFY_CONCURRENCY": lambda: option("notify", "concurrency", 16),
+    "NOTIFY_RETRIES": lambda: option("notify", "retries", 3),
+    # rendered embeds and messages kept for reuse across recipients
+    "RENDER_CACHE_SIZE": lambda: option("notify", "render_cache", 512),
+    # notification outbox, sent entries are kept for `retention` seconds
+    "OUTBOX_BATCH_SIZE": lambda: option("outbox", "batch_size", 100),
+    "OUTBOX_INTERVAL": lambda: option("outbox", "interval", 30),
+    "OUTBOX_RETENTION": lambda: option("outbox", "retention", 604800),
+    # backoff in seconds before retrying a message discord couldn't take, doubling
+    "OUTBOX_RETRY": lambda: option("outbox", "retry", 60),
+    "OUTBOX_MAX_RETRY": lambda: option("outbox", "max_retry", 3600),
+    # seconds a digest user's notifications are coalesced for after one is sent
+    "DIGEST_WINDOW": lambda: option("digest", "window", 300),
+    # scrape polling interval bounds in seconds
+    "POLL_MIN_INTERVAL": lambda: option("poll", "min_interval", 20),
+    "POLL_MAX_INTERVAL": lambda: option("poll", "max_interval", 300),
+    # html parsing executor, threads unless processes is set
+    "PARSE_WORKERS": lambda: option("parse", "workers", 1),
+    "PARSE_PROCESSES": lambda: option("parse", "processes", False),
+    "PARSE_TIMEOUT": lambda: option("parse", "timeout", 10),
+    # event loop lag sampling period and blocking report threshold in seconds
+    "LAG_INTERVAL": lambda: option("lag", "interval", 0.25),
+    "LAG_THRESHOLD": lambda: option("lag", "threshold", 0.5),
+    # logging, json lines unless disabled
+    "LOG_LEVEL": lambda: option("logging", "level", "INFO"),
+    "LOG_JSON": lambda: option("logging", "json", True),
+    # shared http client, timeouts and cooldown in seconds
+    "HTTP_CONNECT_TIMEOUT": lambda: option("http", "connect_timeout", 5),
+    "HTTP_READ_TIMEOUT": lambda: option("http", "read_timeout", 15),
+    "HTTP_TOTAL_TIMEOUT": lambda: option("http", "total_timeout", 30),
+    "HTTP_LIMIT_PER_HOST": lambda: option("http", "limit_per_host", 4),
+    "HTTP_RETRIES": lambda: option("http", "retries", 2),
+    "HTTP_BREAKER_THRESHOLD": lambda: option("http", "breaker_threshold", 5),
+    "HTTP_BREAKER_COOLDOWN": lambda: option("http", "breaker_cooldown", 300),
+    # unix socket the scrape worker publishes diffs on, scraping in-process if unset
+    "IPC_SOCKET": lambda: option("ipc", "socket", None),
+    # seconds the worker waits for the bot to ack a diff before retrying it next cycle
+    "IPC_ACK_TIMEOUT": lambda: option("ipc", "ack_timeout", 30),
+    # local prometheus endpoint, disabled unless a port is set
+    "METRICS_PORT": lambda: option("metrics", "port", None),
+    # mongodb
+    "MONGODB_HOST": lambda: getenv("MONGODB_HOST"),
+    "MONGODB_USERNAME": lambda: getenv("MONGODB_USERNAME"),
+    "MONGODB_PASSWORD": lambda: getenv("MONGODB_PASSWORD"),
+    "MONGODB_URI": mongodb_uri,
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name not in lazy:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = globals()[name] = lazy[name]()
+    return value
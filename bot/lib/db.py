@@ -1,10 +1,21 @@
 """Database utilies."""
 
-from typing import Self
+import asyncio
+import logging
+import sqlite3
+import time
+from contextlib import closing
+from datetime import datetime
+from typing import Any, AsyncIterator, Iterable, Mapping, Self, TypeVar
 
 import discord
-from consts import MONGODB_URI
-from motor.motor_asyncio import AsyncIOMotorClient
+from lib import consts
+from lib.consts import SEEN_PATH
+
+# motor, pymongo and bson are imported where they're used, so the bot only pays for
+# them when a database is configured
+
+log = logging.getLogger(__name__)
 
 schema = {
     "_id": str,
@@ -19,10 +30,39 @@ schema = {
     "preferences": {
         "stats": bool,
         "sets": bool,
+        "digest": bool,
     },
 }
 
 
+T = TypeVar("T")
+
+
+async def chunked(items: AsyncIterator[T], size: int) -> AsyncIterator[list[T]]:
+    """Group an async iterator into lists of at most `size` items."""
+    chunk: list[T] = []
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def database_errors(database: "Database | None") -> tuple[type[Exception], ...]:
+    """Exceptions a failed write to the outbox or the seen store can raise.
+
+    pymongo is only imported when there's a database, sqlite backs the seen store
+    otherwise.
+    """
+    if database is None:
+        return (sqlite3.Error,)
+    from pymongo.errors import PyMongoError
+
+    return (sqlite3.Error, PyMongoError)
+
+
 class DuplicateUserError(Exception):
     """Raised when a user already exists in the database."""
 
@@ -30,6 +70,9 @@ class DuplicateUserError(Exception):
 
 
 class User:
+    # fields stored under "preferences", kept when a user is regenerated from discord
+    preferences = ("stats", "sets", "digest")
+
     def __init__(
         self,
         discord_id: int,
@@ -40,6 +83,7 @@ class User:
         dm_channel_id: int,
         stats: bool = True,
         sets: bool = True,
+        digest: bool = False,
     ):
         self.discord_id: int = discord_id
         self.username: str = username
@@ -49,23 +93,30 @@ class User:
         self.dm_channel_id: int = dm_channel_id
         self.stats: bool = stats
         self.sets: bool = sets
+        self.digest: bool = digest
 
     @classmethod
     async def from_discord_id(
-        cls, discord_client: discord.Client, discord_id: int
+        cls,
+        discord_client: discord.Client,
+        discord_id: int,
+        dm_channel_id: int | None = None,
     ) -> Self:
+        # the user cache is only a shortcut, it's mostly empty without member caching
         user = discord_client.get_user(discord_id) or await discord_client.fetch_user(
             discord_id
         )
-        return await cls.from_discord_user(user)
+        return await cls.from_discord_user(user, dm_channel_id)
 
     @classmethod
-    async def from_discord_user(cls, user: discord.User) -> Self:
-        if user.dm_channel is None:
+    async def from_discord_user(
+        cls, user: discord.User | discord.Member, dm_channel_id: int | None = None
+    ) -> Self:
+        if user.dm_channel is not None:
+            dm_channel_id = user.dm_channel.id
+        elif dm_channel_id is None:  # dm channel ids never change, reuse a known one
             dm_channel = await user.create_dm()
             dm_channel_id = dm_channel.id
-        else:
-            dm_channel_id = user.dm_channel.id
 
         return cls(
             discord_id=user.id,
@@ -87,6 +138,7 @@ class User:
             dm_channel_id=doc["discord"]["dm_channel_id"],
             stats=doc["preferences"]["stats"],
             sets=doc["preferences"]["sets"],
+            digest=doc["preferences"].get("digest", False),
         )
 
     async def to_mongo_doc(self) -> dict:
@@ -99,7 +151,7 @@ class User:
                 "system": self.system,
                 "dm_channel_id": self.dm_channel_id,
             },
-            "preferences": {"stats": self.stats, "sets": self.sets},
+            "preferences": {name: getattr(self, name) for name in self.preferences},
         }
 
     def __eq__(self, __value: object) -> bool:
@@ -116,57 +168,451 @@ class User:
             # and self.dm_channel_id == __value.dm_channel_id
             # and self.stats == __value.stats
             # and self.sets == __value.sets
+            # and self.digest == __value.digest
+        )
+
+
+class SubscriberIndex:
+    """DM channel ids of all users, partitioned by notification preference."""
+
+    def __init__(self) -> None:
+        self.channels: dict[int, int] = {}  # discord id -> dm channel id
+        self.stats: set[int] = set()
+        self.sets: set[int] = set()
+        self.digest: set[int] = set()
+        # user document _id <-> discord id, change stream deletes only carry the _id
+        self.discord_ids: dict[Any, int] = {}
+        self.document_ids: dict[int, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.channels)
+
+    def add(
+        self,
+        discord_id: int,
+        dm_channel_id: int,
+        stats: bool,
+        sets: bool,
+        digest: bool = False,
+        document_id: Any = None,
+    ) -> None:
+        if document_id is None:
+            document_id = self.document_ids.get(discord_id)
+        self.remove(discord_id)
+        self.channels[discord_id] = dm_channel_id
+        if stats:
+            self.stats.add(dm_channel_id)
+        if sets:
+            self.sets.add(dm_channel_id)
+        if digest:
+            self.digest.add(dm_channel_id)
+        if document_id is not None:
+            self.discord_ids[document_id] = discord_id
+            self.document_ids[discord_id] = document_id
+
+    def add_user(self, user: User, document_id: Any = None) -> None:
+        self.add(
+            user.discord_id,
+            user.dm_channel_id,
+            user.stats,
+            user.sets,
+            user.digest,
+            document_id,
         )
 
+    def remove(self, discord_id: int) -> None:
+        dm_channel_id = self.channels.pop(discord_id, None)
+        if dm_channel_id is not None:
+            self.stats.discard(dm_channel_id)
+            self.sets.discard(dm_channel_id)
+            self.digest.discard(dm_channel_id)
+        document_id = self.document_ids.pop(discord_id, None)
+        if document_id is not None:
+            del self.discord_ids[document_id]
+
+    def remove_document(self, document_id: Any) -> None:
+        """Remove the user stored in a deleted document, if it's still indexed."""
+        discord_id = self.discord_ids.get(document_id)
+        if discord_id is not None:
+            self.remove(discord_id)
+
+    def clear(self) -> None:
+        self.channels.clear()
+        self.stats.clear()
+        self.sets.clear()
+        self.digest.clear()
+        self.discord_ids.clear()
+        self.document_ids.clear()
+
 
 class Database:
     def __init__(self, discord_client: discord.Client) -> None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+
         self.discord_client = discord_client
-        self.client = AsyncIOMotorClient(MONGODB_URI)
+        self.client = AsyncIOMotorClient(consts.MONGODB_URI)
         self.db = self.client.primed
         self.users = self.db.users
+        self.seen = self.db.seen
+        self.outbox = self.db.outbox
+        self.subscribers = SubscriberIndex()
+        self.subscribers_loaded = False
+
+    async def create_indexes(self) -> None:
+        """Declare the indexes the queries and duplicate checks rely on.
+
+        `add_user` relies on the unique index on discord.id to reject duplicates, so
+        duplicates stored before it existed are removed to build it. Raises if it still
+        can't be built.
+        """
+        from pymongo.errors import OperationFailure
+
+        try:
+            await self.users.create_index("discord.id", unique=True)
+        except OperationFailure as e:
+            if e.code != 11000:  # duplicate key
+                raise
+            log.warning("duplicate users block the discord.id index, removing them")
+            await self.check_for_duplicates(repair=True)
+            await self.users.create_index("discord.id", unique=True)
+        try:
+            await self.outbox.create_index([("sent", 1), ("created", 1)])
+            await self.outbox.create_index([("channel_id", 1), ("sent", 1)])
+            await self.outbox.create_index(
+                "sent_at", expireAfterSeconds=consts.OUTBOX_RETENTION
+            )
+        except OperationFailure as e:
+            log.error("could not create outbox indexes: %s", e)
 
     async def user_exists(self, discord_id: int) -> bool:
-        return await self.users.find_one({"discord.id": discord_id}) is not None
+        return await self.users.count_documents({"discord.id": discord_id}, limit=1) > 0
+
+    async def get_preferences(self, discord_id: int) -> dict | None:
+        doc = await self.users.find_one(
+            {"discord.id": discord_id}, {"_id": 0, "preferences": 1}
+        )
+        return doc["preferences"] if doc else None
 
     async def get_user(self, discord_id: int) -> User | None:
         doc = await self.users.find_one({"discord.id": discord_id})
         return await User.from_mongo_doc(doc) if doc else None
 
     async def get_all_users(self) -> list[User]:
-        return [await User.from_mongo_doc(doc) async for doc in self.users.find()]
+        return [user async for user in self.iter_users()]
+
+    async def iter_users(
+        self, filter: dict | None = None, batch_size: int = 1000, raw: bool = False
+    ) -> AsyncIterator[User]:
+        """Stream users matching a server-side filter, one cursor batch at a time."""
+        async for doc in self.iter_user_docs(filter, batch_size=batch_size, raw=raw):
+            yield await User.from_mongo_doc(doc)
+
+    async def iter_user_docs(
+        self,
+        filter: dict | None = None,
+        projection: dict | None = None,
+        batch_size: int = 1000,
+        raw: bool = False,
+    ) -> AsyncIterator[Mapping]:
+        """Stream user documents with only the projected fields.
+
+        With `raw` set, documents are `RawBSONDocument`s that decode fields on access.
+        """
+        from bson import CodecOptions
+        from bson.raw_bson import RawBSONDocument
+
+        users = self.users
+        if raw:
+            users = users.with_options(
+                codec_options=CodecOptions(document_class=RawBSONDocument)
+            )
+        async for doc in users.find(filter or {}, projection, batch_size=batch_size):
+            yield doc
 
     async def add_user(self, user: User) -> None:
-        if await self.user_exists(user.discord_id):
-            raise DuplicateUserError(f"user {user.discord_id} already exists")
-        await self.users.insert_one(await user.to_mongo_doc())
+        from pymongo.errors import DuplicateKeyError
+
+        try:
+            result = await self.users.insert_one(await user.to_mongo_doc())
+        except DuplicateKeyError as e:
+            raise DuplicateUserError(f"user {user.discord_id} already exists") from e
+        self.subscribers.add_user(user, result.inserted_id)
 
     async def update_user(self, user: User) -> None:
         await self.users.replace_one(
             {"discord.id": user.discord_id}, await user.to_mongo_doc()
         )
+        self.subscribers.add_user(user)
 
     async def delete_user(self, user: User) -> None:
         await self.users.delete_one({"discord.id": user.discord_id})
+        self.subscribers.remove(user.discord_id)
+
+    async def load_subscribers(self) -> None:
+        """Rebuild the subscriber index from the fields it needs in one scan."""
+        projection = {
+            "discord.id": 1,
+            "discord.dm_channel_id": 1,
+            "preferences": 1,
+        }
+        subscribers = SubscriberIndex()
+        async for doc in self.iter_user_docs(projection=projection, raw=True):
+            subscribers.add(
+                doc["discord"]["id"],
+                doc["discord"]["dm_channel_id"],
+                doc["preferences"]["stats"],
+                doc["preferences"]["sets"],
+                doc["preferences"].get("digest", False),
+                doc["_id"],
+            )
+        self.subscribers = subscribers
+        self.subscribers_loaded = True
+
+    async def get_subscribers(self) -> SubscriberIndex:
+        if not self.subscribers_loaded:
+            await self.load_subscribers()
+        return self.subscribers
+
+    async def watch_subscribers(
+        self, retry: float = 1.0, max_retry: float = 30.0
+    ) -> None:
+        """Keep the subscriber index current with writes made outside this process.
 
-    async def check_for_duplicates(self) -> None:
-        users = await self.get_all_users()
+        The change stream is reopened, with backoff, whenever it fails or is
+        invalidated, and the index is reloaded first so nothing missed in between is
+        left stale. Returns if the server doesn't support change streams.
+        """
+        from pymongo.errors import OperationFailure, PyMongoError
+
+        delay = retry
+        while True:
+            try:
+                async with self.users.watch(full_document="updateLookup") as stream:
+                    delay = retry
+                    async for change in stream:
+                        doc = change.get("fullDocument")
+                        if doc is not None:
+                            user = await User.from_mongo_doc(doc)
+                            self.subscribers.add_user(user, doc["_id"])
+                        elif change["operationType"] == "delete":
+                            self.subscribers.remove_document(
+                                change["documentKey"]["_id"]
+                            )
+                log.warning("subscriber change stream ended, reopening")
+            except OperationFailure as e:
+                if e.code == 40573:  # change streams need a replica set
+                    log.info("subscriber change stream unavailable: %s", e)
+                    return
+                log.warning("subscriber change stream failed, reopening: %s", e)
+            except PyMongoError as e:
+                log.warning("subscriber change stream failed, reopening: %s", e)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_retry)
+            try:
+                await self.load_subscribers()
+            except PyMongoError as e:
+                log.warning("could not reload subscribers: %s", e)
+
+    async def check_for_duplicates(self, repair: bool = False) -> None:
+        """Find users stored more than once, grouped server side.
+
+        Raises `DuplicateUserError` listing the duplicated discord ids, unless `repair` is
+        set, in which case all but the newest document of each id are deleted at once.
+        """
+        pipeline = [
+            {"$sort": {"_id": -1}},
+            {
+                "$group": {
+                    "_id": "$discord.id",
+                    "count": {"$sum": 1},
+                    "docs": {"$push": "$_id"},
+                }
+            },
+            {"$match": {"count": {"$gt": 1}}},
+        ]
         duplicates = []
-        for user in users:
-            if users.count(user) > 1:
-                duplicates.append(user)
-        if duplicates:
+        stale = []
+        async for group in self.users.aggregate(pipeline, allowDiskUse=True):
+            duplicates.append(group["_id"])
+            stale.extend(group["docs"][1:])  # sorted newest first
+
+        if not duplicates:
+            return
+        if not repair:
             raise DuplicateUserError(
                 f"found {len(duplicates)} duplicate(s): {duplicates}"
             )
+        result = await self.users.delete_many({"_id": {"$in": stale}})
+        log.info(
+            "removed %d duplicate(s) of %d user(s)",
+            result.deleted_count,
+            len(duplicates),
+        )
 
     async def regenerate_user(self, discord_id: int) -> None:
-        user = await User.from_discord_id(self.discord_client, discord_id)
+        """Refresh the discord profile of a stored user, keeping their preferences."""
+        stored = await self.get_user(discord_id)
+        if stored is None:
+            return
+        user = await User.from_discord_id(
+            self.discord_client, discord_id, stored.dm_channel_id
+        )
+        for name in User.preferences:
+            setattr(user, name, getattr(stored, name))
         await self.update_user(user)
 
-    async def regenerate_all_users(self) -> None:
-        for user in await self.get_all_users():
-            await self.regenerate_user(user.discord_id)
+    async def regenerate_all_users(
+        self, concurrency: int = 8, chunk_size: int = 500
+    ) -> None:
+        """Refresh the discord profile of every user, keeping their preferences.
+
+        Users are resolved concurrently, preferring the gateway cache, and only users
+        whose profile changed are written back, one `bulk_write` per chunk.
+        """
+        from pymongo import ReplaceOne
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def regenerate(user: User) -> User | None:
+            async with semaphore:
+                try:
+                    fresh = await User.from_discord_id(
+                        self.discord_client, user.discord_id, user.dm_channel_id
+                    )
+                except discord.HTTPException as e:
+                    log.warning("could not regenerate user %d: %s", user.discord_id, e)
+                    return None
+            for name in User.preferences:
+                setattr(fresh, name, getattr(user, name))
+            return fresh if vars(fresh) != vars(user) else None
+
+        total = await self.users.estimated_document_count()
+        started = time.perf_counter()
+        done = 0
+        updated = 0
+        async for chunk in chunked(self.iter_users(batch_size=chunk_size), chunk_size):
+            changed = [
+                user
+                for user in await asyncio.gather(*map(regenerate, chunk))
+                if user is not None
+            ]
+            if changed:
+                await self.users.bulk_write(
+                    [
+                        ReplaceOne(
+                            {"discord.id": user.discord_id}, await user.to_mongo_doc()
+                        )
+                        for user in changed
+                    ],
+                    ordered=False,
+                )
+                for user in changed:
+                    self.subscribers.add_user(user)
+            updated += len(changed)
+
+            done += len(chunk)
+            elapsed = time.perf_counter() - started
+            log.info(
+                "regenerated %d/%d users, %d updated (%.1f users/s)",
+                done,
+                total,
+                updated,
+                done / elapsed if elapsed else 0,
+            )
+
+    async def get_seen_links(self) -> set[str]:
+        return {doc["_id"] async for doc in self.seen.find({}, {"_id": 1})}
+
+    async def get_seen_times(self) -> list[datetime]:
+        cursor = self.seen.find({"seen_at": {"$ne": None}}, {"_id": 0, "seen_at": 1})
+        return [doc["seen_at"] async for doc in cursor]
+
+    async def add_seen_links(self, links: Iterable[str]) -> None:
+        from pymongo import UpdateOne
+
+        now = datetime.utcnow()
+        requests = [
+            UpdateOne({"_id": link}, {"$setOnInsert": {"seen_at": now}}, upsert=True)
+            for link in links
+        ]
+        if requests:
+            await self.seen.bulk_write(requests, ordered=False)
+
+    async def enqueue_notifications(self, entries: Iterable[dict]) -> int:
+        """Add outbox entries keyed by their `_id`, skipping any already enqueued.
+
+        Returns how many entries were new, so re-diffing items after a crash doesn't
+        queue their notifications a second time.
+        """
+        from pymongo import UpdateOne
+
+        now = datetime.utcnow()
+        requests = [
+            UpdateOne(
+                {"_id": entry["_id"]},
+                {
+                    "$setOnInsert": {
+                        **entry,
+                        "created": now,
+                        "not_before": now,
+                        "sent": False,
+                    }
+                },
+                upsert=True,
+            )
+            for entry in entries
+        ]
+        if not requests:
+            return 0
+        result = await self.outbox.bulk_write(requests, ordered=False)
+        return result.upserted_count
+
+    async def get_pending_notifications(
+        self, limit: int = 0, channel_id: int | None = None
+    ) -> list[dict]:
+        """Oldest outbox entries that haven't been delivered yet and are due.
+
+        `limit` 0 returns all of them, `channel_id` only those for one DM channel.
+        """
+        filter: dict = {
+            "sent": False,
+            "not_before": {"$not": {"$gt": datetime.utcnow()}},
+        }
+        if channel_id is not None:
+            filter["channel_id"] = channel_id
+        cursor = self.outbox.find(filter).sort("created", 1).limit(limit)
+        return await cursor.to_list(length=limit or None)
+
+    async def defer_notifications(
+        self, keys: Iterable[str], until: datetime, retry: bool = False
+    ) -> None:
+        """Hold outbox entries back until a time, to coalesce digests or to `retry`.
+
+        Retries are counted in the entries' `attempts` so their backoff can grow.
+        """
+        keys = list(keys)
+        if keys:
+            update: dict = {"$set": {"not_before": until}}
+            if retry:
+                update["$inc"] = {"attempts": 1}
+            await self.outbox.update_many({"_id": {"$in": keys}}, update)
+
+    async def mark_notifications_sent(
+        self, keys: Iterable[str], failed: bool = False
+    ) -> None:
+        """Mark outbox entries done in one write, `failed` if they can't be delivered."""
+        keys = list(keys)
+        if keys:
+            await self.outbox.update_many(
+                {"_id": {"$in": keys}},
+                {
+                    "$set": {
+                        "sent": True,
+                        "failed": failed,
+                        "sent_at": datetime.utcnow(),
+                    }
+                },
+            )
 
     async def close(self) -> None:
         self.client.close()
@@ -176,3 +622,84 @@ class Database:
 
     async def __aexit__(self, exc_type, exc_value, traceback) -> None:
         await self.close()
+
+
+class SeenItems:
+    """Links of every scraped item, persisted so restarts keep the diff baseline.
+
+    Backed by the `seen` collection when a database is given, otherwise by a local
+    SQLite file. Lookups only hit the in-memory set.
+    """
+
+    def __init__(self, database: Database | None = None, path: str = SEEN_PATH):
+        self.database = database
+        self.path = path
+        self.links: set[str] = set()
+
+    def __contains__(self, link: object) -> bool:
+        return link in self.links
+
+    def __len__(self) -> int:
+        return len(self.links)
+
+    async def load(self) -> None:
+        """Load every seen link in one bulk read."""
+        if self.database is not None:
+            self.links = await self.database.get_seen_links()
+        else:
+            self.links = await asyncio.to_thread(self._load_sqlite)
+
+    async def detected_times(self) -> list[datetime]:
+        """When every item seen after the first scrape was detected.
+
+        Items already posted at the first scrape were all recorded at once then, so
+        they're left out, they don't say anything about when items get posted.
+        """
+        if self.database is not None:
+            times = await self.database.get_seen_times()
+        else:
+            times = await asyncio.to_thread(self._seen_times_sqlite)
+        first = min(times, default=None)
+        return [when for when in times if when != first]
+
+    async def add(self, links: Iterable[str]) -> None:
+        """Persist the links that haven't been seen yet in one bulk write."""
+        new = [link for link in dict.fromkeys(links) if link not in self.links]
+        if not new:
+            return
+        if self.database is not None:
+            await self.database.add_seen_links(new)
+        else:
+            await asyncio.to_thread(self._add_sqlite, new)
+        self.links.update(new)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen (link TEXT PRIMARY KEY, seen_at TEXT)"
+        )
+        columns = {column[1] for column in conn.execute("PRAGMA table_info(seen)")}
+        if "seen_at" not in columns:  # stores from before detection times were kept
+            conn.execute("ALTER TABLE seen ADD COLUMN seen_at TEXT")
+        return conn
+
+    def _load_sqlite(self) -> set[str]:
+        with closing(self._connect()) as conn:
+            return {link for (link,) in conn.execute("SELECT link FROM seen")}
+
+    def _seen_times_sqlite(self) -> list[datetime]:
+        with closing(self._connect()) as conn:
+            return [
+                datetime.fromisoformat(seen_at)
+                for (seen_at,) in conn.execute(
+                    "SELECT seen_at FROM seen WHERE seen_at IS NOT NULL"
+                )
+            ]
+
+    def _add_sqlite(self, links: list[str]) -> None:
+        now = datetime.utcnow().isoformat()
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO seen (link, seen_at) VALUES (?, ?)",
+                ((link, now) for link in links),
+            )
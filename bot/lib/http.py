@@ -0,0 +1,143 @@
+"""Shared HTTP client with timeouts, pooling, retries and a circuit breaker."""
+
+import asyncio
+import logging
+import random
+import time
+from typing import NamedTuple
+
+from aiohttp import (
+    ClientError,
+    ClientResponseError,
+    ClientSession,
+    ClientTimeout,
+    TCPConnector,
+)
+from lib import consts
+from lib.metrics import metrics
+from multidict import CIMultiDictProxy
+
+try:
+    import brotli  # noqa: F401
+
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:  # aiohttp can only decode brotli with the brotli package installed
+    ACCEPT_ENCODING = "gzip, deflate"
+
+log = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised when requests are refused because the host keeps failing."""
+
+    pass
+
+
+class Response(NamedTuple):
+    status: int
+    headers: CIMultiDictProxy[str]
+    text: str
+
+
+def create_session() -> ClientSession:
+    """Create the bot's shared aiohttp session."""
+    return ClientSession(
+        connector=TCPConnector(
+            limit_per_host=consts.HTTP_LIMIT_PER_HOST,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+        ),
+        timeout=ClientTimeout(
+            total=consts.HTTP_TOTAL_TIMEOUT,
+            sock_connect=consts.HTTP_CONNECT_TIMEOUT,
+            sock_read=consts.HTTP_READ_TIMEOUT,
+        ),
+        headers={"Accept-Encoding": ACCEPT_ENCODING},
+    )
+
+
+class HTTPClient:
+    """GET with jittered retries, per-request latency metrics and a circuit breaker.
+
+    After `breaker_threshold` consecutive failed requests the circuit opens and requests
+    fail fast with `CircuitOpenError` until `breaker_cooldown` seconds have passed, then
+    a single trial request is let through.
+    """
+
+    def __init__(
+        self,
+        session: ClientSession,
+        retries: int | None = None,
+        breaker_threshold: int | None = None,
+        breaker_cooldown: float | None = None,
+    ):
+        self.session = session
+        self.retries = consts.HTTP_RETRIES if retries is None else retries
+        self.breaker_threshold = (
+            consts.HTTP_BREAKER_THRESHOLD
+            if breaker_threshold is None
+            else breaker_threshold
+        )
+        self.breaker_cooldown = (
+            consts.HTTP_BREAKER_COOLDOWN
+            if breaker_cooldown is None
+            else breaker_cooldown
+        )
+        self.failures = 0
+        self.opened_at: float | None = None
+
+    @property
+    def circuit_open(self) -> bool:
+        return (
+            self.opened_at is not None
+            and time.monotonic() - self.opened_at < self.breaker_cooldown
+        )
+
+    async def get(self, url: str, headers: dict[str, str] | None = None) -> Response:
+        """GET a url and read its body, retrying timeouts, connection errors and 5xx."""
+        if self.circuit_open:
+            raise CircuitOpenError(f"circuit open for {url}")
+
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                async with self.session.get(url, headers=headers) as response:
+                    if response.status in RETRY_STATUSES and attempt < self.retries:
+                        raise ClientError(f"{response.status} {response.reason}")
+                    response.raise_for_status()
+                    text = await response.text() if response.status != 304 else ""
+                    result = Response(response.status, response.headers, text)
+            except (ClientError, asyncio.TimeoutError) as e:
+                metrics.observe("http", time.perf_counter() - start)
+                if (
+                    isinstance(e, ClientResponseError)
+                    and e.status not in RETRY_STATUSES
+                ):
+                    raise  # the host answered, retrying won't change a 4xx
+                if attempt == self.retries:
+                    self.record_failure()
+                    raise
+                metrics.incr("http_retries")
+                log.debug("GET %s failed (%s), retrying", url, e)
+                await asyncio.sleep(2**attempt * random.uniform(0.5, 1.5))
+                continue
+
+            metrics.observe("http", time.perf_counter() - start)
+            self.failures = 0
+            self.opened_at = None
+            return result
+        raise AssertionError("unreachable")
+
+    def record_failure(self) -> None:
+        metrics.incr("http_errors")
+        self.failures += 1
+        if self.failures >= self.breaker_threshold:
+            if not self.circuit_open:
+                log.warning(
+                    "circuit opened after %d failures, pausing requests for %ss",
+                    self.failures,
+                    self.breaker_cooldown,
+                )
+            self.opened_at = time.monotonic()
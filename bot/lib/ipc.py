@@ -0,0 +1,143 @@
+"""Local IPC between the scrape worker and the bot, json lines over a unix socket.
+
+Every diff the worker publishes carries a sequence number, which the bot sends back
+once the diff is in its outbox. The worker only marks a diff's items seen after that.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, Set
+
+from lib import consts
+
+log = logging.getLogger(__name__)
+
+# longest line either side will read, diffs are a few kilobytes at most
+LINE_LIMIT = 2**20
+
+
+class NotDeliveredError(Exception):
+    """Raised when no bot acknowledged a published diff."""
+
+    pass
+
+
+class DiffPublisher:
+    """Unix socket server the scrape worker publishes diffs on.
+
+    A diff counts as delivered once a bot acks it, which it does after queueing its
+    notifications in the database. Until then the worker keeps its items unseen, so a
+    diff that's lost to either side restarting is diffed and published again.
+    """
+
+    def __init__(self, path: str, timeout: float | None = None):
+        self.path = path
+        self.timeout = consts.IPC_ACK_TIMEOUT if timeout is None else timeout
+        self.seq = 0
+        self.acks: Dict[int, asyncio.Future] = {}
+        self.writers: Set[asyncio.StreamWriter] = set()
+        self.server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        if os.path.exists(self.path):
+            # left over from a worker that didn't shut down cleanly
+            os.unlink(self.path)
+        self.server = await asyncio.start_unix_server(
+            self.connected, self.path, limit=LINE_LIMIT
+        )
+        log.info("publishing diffs on %s", self.path)
+
+    async def connected(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        log.info("bot connected")
+        self.writers.add(writer)
+        try:
+            async for line in reader:
+                future = self.acks.get(json.loads(line).get("ack"))
+                if future is not None and not future.done():
+                    future.set_result(None)
+        except (ConnectionError, ValueError) as e:
+            log.warning("dropping bot connection: %s", e)
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+            log.info("bot disconnected")
+
+    async def publish(self, message: Dict[str, Any]) -> None:
+        """Send a message to every connected bot and wait for one of them to ack it.
+
+        Raises `NotDeliveredError` if no bot is connected or none acks in `timeout`.
+        """
+        self.seq += 1
+        seq = self.seq
+        line = (
+            json.dumps({**message, "seq": seq}, separators=(",", ":")) + "\n"
+        ).encode()
+        future = self.acks[seq] = asyncio.get_running_loop().create_future()
+        try:
+            sent = False
+            for writer in list(self.writers):
+                try:
+                    writer.write(line)
+                    await writer.drain()
+                    sent = True
+                except ConnectionError:
+                    self.writers.discard(writer)
+            if not sent:
+                raise NotDeliveredError("no bot connected")
+            try:
+                await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                raise NotDeliveredError(
+                    f"diff {seq} wasn't acked in {self.timeout}s"
+                ) from None
+        finally:
+            del self.acks[seq]
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            for writer in list(self.writers):
+                writer.close()
+            await self.server.wait_closed()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+async def subscribe(
+    path: str, retry: float = 1.0, max_retry: float = 30.0
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yield messages published by the scrape worker, reconnecting whenever it restarts.
+
+    A message is acked when the next one is asked for, so the caller should only move
+    on once it has handled a message. Breaking out of the loop or raising leaves the
+    current message unacked and the worker publishes it again.
+    """
+    delay = retry
+    while True:
+        try:
+            reader, writer = await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+        except (FileNotFoundError, ConnectionError) as e:
+            log.warning("scrape worker not reachable (%s), retrying in %.0fs", e, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_retry)
+            continue
+
+        delay = retry
+        log.info("connected to scrape worker on %s", path)
+        try:
+            async for line in reader:
+                message = json.loads(line)
+                seq = message.pop("seq", None)
+                yield message
+                if seq is not None:
+                    writer.write(json.dumps({"ack": seq}).encode() + b"\n")
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+        log.warning("scrape worker disconnected, reconnecting")
@@ -0,0 +1,74 @@
+"""Event loop lag sampling and blocking-call watchdog."""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from lib import consts
+from lib.metrics import metrics
+
+log = logging.getLogger(__name__)
+
+
+class LagMonitor:
+    """Measure how late the event loop wakes up and catch whatever is blocking it.
+
+    A sampler task records scheduling delay into the `loop_lag` metric. A watchdog
+    thread notices when the sampler stops checking in and prints the stack the loop
+    thread is stuck in, while it is still stuck.
+    """
+
+    def __init__(self, interval: float | None = None, threshold: float | None = None):
+        self.interval = consts.LAG_INTERVAL if interval is None else interval
+        self.threshold = consts.LAG_THRESHOLD if threshold is None else threshold
+        self.current: float = 0.0
+        self.peak: float = 0.0
+        self.heartbeat = time.monotonic()
+        self.loop_thread_id: int | None = None
+        self.task: asyncio.Task | None = None
+        self.stopped = threading.Event()
+
+    def start(self) -> None:
+        """Start sampling, must be called from the event loop thread."""
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self.task = asyncio.create_task(self.sample())
+        threading.Thread(target=self.watch, name="lag-watchdog", daemon=True).start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.task is not None:
+            self.task.cancel()
+
+    async def sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.current = max(0.0, loop.time() - start - self.interval)
+            self.peak = max(self.peak, self.current)
+            self.heartbeat = time.monotonic()
+            metrics.observe("loop_lag", self.current)
+
+    def watch(self) -> None:
+        reported = False
+        while not self.stopped.wait(self.threshold / 2):
+            blocked = time.monotonic() - self.heartbeat - self.interval
+            if blocked < self.threshold:
+                reported = False
+                continue
+            if reported:
+                continue
+            reported = True
+            frame = sys._current_frames().get(self.loop_thread_id)  # type: ignore
+            if frame is None:
+                continue
+            metrics.incr("loop_blocked")
+            log.warning(
+                "event loop blocked for %.2fs in:\n%s",
+                blocked,
+                "".join(traceback.format_stack(frame)),
+            )
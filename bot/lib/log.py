@@ -0,0 +1,50 @@
+"""Logging setup that keeps formatting and output off the event loop."""
+
+import json
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+from lib import consts
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def setup_logging(
+    level: str | None = None, use_json: bool | None = None
+) -> QueueListener:
+    """Route all logging through a queue drained by a background thread.
+
+    Callers only pay for putting a record on the queue; formatting and writing to the
+    stream happen on the listener thread. Stop the returned listener to flush it.
+    """
+    level = consts.LOG_LEVEL if level is None else level
+    use_json = consts.LOG_JSON if use_json is None else use_json
+    handler = logging.StreamHandler()
+    handler.setFormatter(
+        JSONFormatter()
+        if use_json
+        else logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(QueueHandler(log_queue))
+
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    return listener
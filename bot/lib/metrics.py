@@ -0,0 +1,82 @@
+"""Per-cycle pipeline metrics kept in ring buffers."""
+
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Iterator
+
+from aiohttp import web
+
+WINDOW = 512  # samples kept per stage
+
+
+class Metrics:
+    """Timings per pipeline stage and counters for everything else."""
+
+    def __init__(self, window: int = WINDOW):
+        self.timings: defaultdict[str, deque[float]] = defaultdict(
+            lambda: deque(maxlen=window)
+        )
+        self.timing_totals: defaultdict[str, float] = defaultdict(float)
+        self.timing_counts: defaultdict[str, int] = defaultdict(int)
+        self.counters: defaultdict[str, int] = defaultdict(int)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        self.timings[stage].append(seconds)
+        self.timing_totals[stage] += seconds
+        self.timing_counts[stage] += 1
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def incr(self, counter: str, amount: int = 1) -> None:
+        self.counters[counter] += amount
+
+    def percentile(self, stage: str, q: float) -> float:
+        """Nearest-rank percentile of the recent samples of a stage, 0 if there are none."""
+        samples = sorted(self.timings[stage])
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = ["# TYPE primed_stage_seconds summary"]
+        for stage in self.timings:
+            for q in (0.5, 0.9, 0.99):
+                lines.append(
+                    f'primed_stage_seconds{{stage="{stage}",quantile="{q}"}}'
+                    f" {self.percentile(stage, q)}"
+                )
+            lines.append(
+                f'primed_stage_seconds_sum{{stage="{stage}"}} {self.timing_totals[stage]}'
+            )
+            lines.append(
+                f'primed_stage_seconds_count{{stage="{stage}"}} {self.timing_counts[stage]}'
+            )
+        for counter, value in self.counters.items():
+            lines.append(f"# TYPE primed_{counter}_total counter")
+            lines.append(f"primed_{counter}_total {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+async def start_metrics_server(port: int) -> web.AppRunner:
+    """Serve `/metrics` for Prometheus on localhost."""
+
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(text=metrics.prometheus())
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
@@ -0,0 +1,307 @@
+"""Notification delivery to subscribers' DMs."""
+
+import asyncio
+import enum
+import logging
+import random
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+import aiohttp
+import discord
+from lib import consts
+from lib.db import Database
+from lib.metrics import metrics
+
+log = logging.getLogger(__name__)
+
+
+class Delivery(enum.Enum):
+    """How sending a message went."""
+
+    SENT = "sent"
+    RETRY = "retry"  # discord or the connection failed, worth sending again later
+    FAILED = "failed"  # dms closed or channel gone, sending again won't help
+
+
+class RenderedEmbed(discord.Embed):
+    """Embed serialized once and shared read-only by every recipient of an item.
+
+    discord.py calls `to_dict` for every message it sends, this returns the payload
+    built when the embed was rendered instead of rebuilding it.
+    """
+
+    __slots__ = ("payload",)
+
+    payload: Any
+
+    @classmethod
+    def render(cls, embed: discord.Embed) -> "RenderedEmbed":
+        payload = embed.to_dict()
+        rendered = cls.from_dict(payload)
+        rendered.payload = payload
+        return rendered
+
+    def to_dict(self) -> Any:
+        return self.payload
+
+
+class RenderCache:
+    """Rendered embeds of recent items and the messages built from them.
+
+    The most recently used `size` of each are kept. Messages are keyed by the items they
+    carry, so every recipient of the same items, one item or a digest of up to 10, is
+    sent the same list of embeds.
+    """
+
+    def __init__(
+        self, render: Callable[[dict], discord.Embed], size: int | None = None
+    ):
+        self.render = render
+        self.size = consts.RENDER_CACHE_SIZE if size is None else size
+        self.embeds: OrderedDict[str, RenderedEmbed] = OrderedDict()
+        self.messages: OrderedDict[Tuple[str, ...], List[RenderedEmbed]] = OrderedDict()
+
+    def embed(self, key: str, item: dict) -> RenderedEmbed:
+        embed = self.embeds.get(key)
+        if embed is None:
+            embed = self.embeds[key] = RenderedEmbed.render(self.render(item))
+            metrics.incr("renders")
+            if len(self.embeds) > self.size:
+                self.embeds.popitem(last=False)
+        else:
+            self.embeds.move_to_end(key)
+        return embed
+
+    def message(self, entries: Sequence[dict]) -> List[RenderedEmbed]:
+        """Embeds for one message carrying the items of these outbox entries."""
+        key = tuple(entry["key"] for entry in entries)
+        embeds = self.messages.get(key)
+        if embeds is None:
+            embeds = self.messages[key] = [
+                self.embed(entry["key"], entry["item"]) for entry in entries
+            ]
+            if len(self.messages) > self.size:
+                self.messages.popitem(last=False)
+        else:
+            self.messages.move_to_end(key)
+        return embeds
+
+
+class Notifier:
+    """Fan out embeds to DM channels with bounded concurrency.
+
+    Messages are sent straight to the stored DM channel ids through discord.py's HTTP
+    client, so every send shares its per-route rate limit buckets and no recipient needs
+    a `fetch_user`.
+    """
+
+    def __init__(
+        self,
+        discord_client: discord.Client,
+        concurrency: int | None = None,
+        retries: int | None = None,
+    ):
+        self.discord_client = discord_client
+        self.semaphore = asyncio.Semaphore(
+            consts.NOTIFY_CONCURRENCY if concurrency is None else concurrency
+        )
+        self.retries = consts.NOTIFY_RETRIES if retries is None else retries
+
+    async def send(self, channel_id: int, embeds: Sequence[discord.Embed]) -> Delivery:
+        """Send up to 10 embeds as one message to a DM channel.
+
+        Retries with backoff on 429, 5xx and connection errors, and gives up with
+        `Delivery.RETRY` if they persist so the caller can try again later.
+        """
+        channel = self.discord_client.get_partial_messageable(
+            channel_id, type=discord.ChannelType.private
+        )
+        async with self.semaphore:
+            for attempt in range(self.retries + 1):
+                try:
+                    await channel.send(embeds=list(embeds))
+                    return Delivery.SENT
+                except (discord.Forbidden, discord.NotFound):
+                    metrics.incr("notify_failures")
+                    return Delivery.FAILED
+                except discord.HTTPException as e:
+                    if e.status != 429 and e.status < 500:
+                        log.warning("failed to notify %d: %s", channel_id, e)
+                        metrics.incr("notify_failures")
+                        return Delivery.FAILED
+                    error: Exception = e
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = e
+                if attempt == self.retries:
+                    log.warning("could not notify %d yet: %s", channel_id, error)
+                    metrics.incr("notify_failures")
+                    return Delivery.RETRY
+                metrics.incr("notify_retries")
+                await asyncio.sleep(2**attempt + random.random())
+        return Delivery.RETRY
+
+    async def fan_out(
+        self,
+        deliveries: Iterable[Tuple[int, Sequence[discord.Embed]]],
+        detected: datetime,
+    ) -> List[Delivery]:
+        """Send every (channel id, embeds) message and report throughput and latency.
+
+        Returns how each delivery went, in order.
+        """
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(self.send(channel_id, embeds) for channel_id, embeds in deliveries)
+        )
+        elapsed = time.perf_counter() - start
+        latency = (datetime.utcnow() - detected).total_seconds()
+
+        sent = results.count(Delivery.SENT)
+        metrics.incr("notifications_sent", sent)
+        metrics.observe("detection_latency", latency)
+        log.info(
+            "notified %d/%d in %.2fs (%.1f msg/s), detection to last dm %.2fs",
+            sent,
+            len(results),
+            elapsed,
+            sent / elapsed if elapsed else 0,
+            latency,
+        )
+        return results
+
+
+class Outbox:
+    """Deliver the database outbox in batches, resuming whatever was left on startup.
+
+    Entries are marked sent in bulk after each batch, so a crash resends at most one
+    batch, and the notifications of items diffed again after a restart are skipped when
+    they're enqueued.
+
+    Digest entries are sent straight away when their channel hasn't had a message for
+    `digest_window`. Otherwise they're held until the window ends and go out together,
+    10 embeds per message.
+
+    Messages discord couldn't take because of an outage or rate limits are held and
+    retried after `retry` seconds, doubling each time up to `max_retry`. Only messages
+    to closed DMs or deleted channels are given up on.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        notifier: Notifier,
+        render: Callable[[dict], discord.Embed],
+        batch_size: int | None = None,
+        interval: float | None = None,
+        digest_window: float | None = None,
+        retry: float | None = None,
+        max_retry: float | None = None,
+    ):
+        self.database = database
+        self.notifier = notifier
+        self.cache = RenderCache(render)
+        self.batch_size = consts.OUTBOX_BATCH_SIZE if batch_size is None else batch_size
+        self.interval = consts.OUTBOX_INTERVAL if interval is None else interval
+        self.digest_window = timedelta(
+            seconds=consts.DIGEST_WINDOW if digest_window is None else digest_window
+        )
+        self.retry = consts.OUTBOX_RETRY if retry is None else retry
+        self.max_retry = consts.OUTBOX_MAX_RETRY if max_retry is None else max_retry
+        self.last_digest: Dict[int, datetime] = {}  # dm channel id -> last digest sent
+        self.next_due: datetime | None = None
+        self.wakeup = asyncio.Event()
+
+    def wake(self) -> None:
+        """Drain now instead of at the next interval."""
+        self.wakeup.set()
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.drain()
+            except Exception:
+                metrics.incr("outbox_errors")
+                log.exception("could not drain the notification outbox")
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.timeout())
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+
+    def timeout(self) -> float:
+        """Seconds until the next drain, sooner if held digests or retries come due first."""
+        if self.next_due is None:
+            return self.interval
+        due = (self.next_due - datetime.utcnow()).total_seconds()
+        return min(self.interval, max(due, 0))
+
+    async def drain(self) -> None:
+        """Send pending entries that are due until none are left."""
+        self.next_due = None
+        while entries := await self.database.get_pending_notifications(self.batch_size):
+            now = datetime.utcnow()
+            by_channel: Dict[int, List[dict]] = {}
+            for entry in entries:
+                by_channel.setdefault(entry["channel_id"], []).append(entry)
+
+            messages: List[List[dict]] = []
+            for channel_id, channel_entries in by_channel.items():
+                if not channel_entries[0].get("digest"):
+                    messages.extend([entry] for entry in channel_entries)
+                    continue
+                last = self.last_digest.get(channel_id)
+                if last is not None and now - last < self.digest_window:
+                    until = last + self.digest_window
+                    await self.database.defer_notifications(
+                        (entry["_id"] for entry in channel_entries), until
+                    )
+                    if self.next_due is None or until < self.next_due:
+                        self.next_due = until
+                    continue
+                self.last_digest[channel_id] = now
+                # a burst can be split across batches, send all of it in this digest
+                channel_entries = await self.database.get_pending_notifications(
+                    channel_id=channel_id
+                )
+                for start in range(0, len(channel_entries), 10):
+                    end = start + 10
+                    messages.append(channel_entries[start:end])
+                metrics.incr("digest_coalesced", len(channel_entries))
+
+            if not messages:
+                continue
+            results = await self.notifier.fan_out(
+                [
+                    (message[0]["channel_id"], self.cache.message(message))
+                    for message in messages
+                ],
+                min(entry["detected"] for message in messages for entry in message),
+            )
+            sent: List[str] = []
+            failed: List[str] = []
+            retry: Dict[datetime, List[str]] = {}
+            now = datetime.utcnow()
+            for message, result in zip(messages, results):
+                keys = [entry["_id"] for entry in message]
+                if result is Delivery.SENT:
+                    sent.extend(keys)
+                elif result is Delivery.FAILED:
+                    failed.extend(keys)
+                else:
+                    attempts = max(entry.get("attempts", 0) for entry in message)
+                    backoff = min(self.retry * 2**attempts, self.max_retry)
+                    until = now + timedelta(seconds=backoff)
+                    retry.setdefault(until, []).extend(keys)
+                    # a digest that didn't go out shouldn't hold back its retry
+                    self.last_digest.pop(message[0]["channel_id"], None)
+            await self.database.mark_notifications_sent(sent)
+            await self.database.mark_notifications_sent(failed, failed=True)
+            for until, keys in retry.items():
+                await self.database.defer_notifications(keys, until, retry=True)
+                if self.next_due is None or until < self.next_due:
+                    self.next_due = until
+            metrics.incr("outbox_delivered", len(sent) + len(failed))
+            metrics.incr("outbox_retries", sum(map(len, retry.values())))
@@ -0,0 +1,141 @@
+"""Extract recent stats and sets from the HTML of the hsqb front page.
+
+Everything here takes and returns plain strings and tuples, so it can run in a worker
+thread or process without touching bot state.
+"""
+
+import logging
+import re
+from functools import cache
+from typing import TYPE_CHECKING, Tuple
+
+from lib.consts import HSQB
+
+if TYPE_CHECKING:
+    from bs4 import SoupStrainer, Tag
+
+log = logging.getLogger(__name__)
+
+STATS_ID = "RecentStats"
+SETS_ID = "RecentlyPostedSets"
+
+# div tags, and the comments, scripts and styles whose contents aren't markup
+DIV_TAG = re.compile(
+    r"<!--.*?-->|<(script|style)\b.*?</\1\s*>|<(/?)div\b",
+    re.IGNORECASE | re.DOTALL,
+)
+
+StatReportRow = Tuple[str, str]
+TournamentRow = Tuple[str, str, Tuple[StatReportRow, ...]]
+SetRow = Tuple[str, str]
+
+
+def section_html(html: str, section_id: str) -> str | None:
+    """Slice the raw HTML of the div with the given id out of a page, without parsing it."""
+    # the whole id attribute, not data-id="..." or an id that only starts with it
+    match = re.search(
+        rf"<div\b[^>]*(?<![\w-])id=([\"']?){section_id}\1(?=[\s/>])[^>]*>",
+        html,
+        re.IGNORECASE,
+    )
+    if match is None:
+        return None
+
+    depth = 1
+    for tag in DIV_TAG.finditer(html, match.end()):
+        if tag.group(2) is None:
+            continue  # a comment, script or style
+        depth += -1 if tag.group(2) else 1
+        if depth == 0:
+            start, end = match.start(), html.find(">", tag.end()) + 1
+            return html[start:end]
+    return None
+
+
+# bs4 is imported on first use, inside a parse worker, to keep it off the startup path
+
+
+@cache
+def sections_strainer() -> "SoupStrainer":
+    """Strainer that only builds the front page sections we read into a tree."""
+    from bs4 import SoupStrainer
+
+    return SoupStrainer(id=[STATS_ID, SETS_ID])
+
+
+def extract_page(
+    html: str,
+) -> Tuple[Tuple[TournamentRow, ...], Tuple[SetRow, ...]]:
+    """Extract stats and sets from a whole page.
+
+    Only the `#RecentStats` and `#RecentlyPostedSets` divs are built into a tree. If the
+    markup doesn't look like we expect, the whole page is parsed instead.
+    """
+    from bs4 import BeautifulSoup
+
+    try:
+        soup = BeautifulSoup(html, "html.parser", parse_only=sections_strainer())
+        return (
+            extract_stats_div(soup.find(id=STATS_ID)),  # type: ignore
+            extract_sets_div(soup.find(id=SETS_ID)),  # type: ignore
+        )
+    except (AttributeError, KeyError, TypeError):
+        log.warning("unexpected page markup, falling back to full parse")
+
+    soup = BeautifulSoup(html, "html.parser")
+    return (
+        extract_stats_div(soup.find(id=STATS_ID)),  # type: ignore
+        extract_sets_div(soup.find(id=SETS_ID)),  # type: ignore
+    )
+
+
+def extract_stats(html: str) -> Tuple[TournamentRow, ...]:
+    """Extract stats from the raw HTML of the `#RecentStats` section."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    return extract_stats_div(soup.find(id=STATS_ID))  # type: ignore
+
+
+def extract_sets(html: str) -> Tuple[SetRow, ...]:
+    """Extract sets from the raw HTML of the `#RecentlyPostedSets` section."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    return extract_sets_div(soup.find(id=SETS_ID))  # type: ignore
+
+
+def extract_stats_div(stats_div: "Tag") -> Tuple[TournamentRow, ...]:
+    tournaments = stats_div.find("ul", class_="Tournaments").find_all(  # type: ignore
+        "li", recursive=False
+    )
+    scraped_stats = []
+
+    for tournament in tournaments:
+        tournament_name = str(
+            tournament.find("span", class_="Tournament").find("a").string
+        )
+        tournament_link = HSQB + str(
+            tournament.find("span", class_="Tournament").find("a")["href"]
+        )
+        stat_reports = tuple(
+            (str(report.find("a").string), HSQB + str(report.find("a")["href"]))
+            for report in tournament.find("ul", class_="Reports").find_all("li")
+        )
+        scraped_stats.append((tournament_name, tournament_link, stat_reports))
+
+    return tuple(scraped_stats)
+
+
+def extract_sets_div(sets_div: "Tag") -> Tuple[SetRow, ...]:
+    sets = sets_div.find("ul", class_="NoHeader").find_all(  # type: ignore
+        "li", recursive=False
+    )
+    scraped_sets = []
+
+    for set in sets:
+        set_name = str(set.find("span", class_="Name").find("a").string)
+        set_link = HSQB + str(set.find("span", class_="Name").find("a")["href"])
+        scraped_sets.append((set_name, set_link))
+
+    return tuple(scraped_sets)
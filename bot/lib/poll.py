@@ -0,0 +1,73 @@
+"""Adaptive polling interval for the scraper."""
+
+import random
+from datetime import datetime
+from typing import Iterable
+
+from lib import consts
+
+HOURS_PER_WEEK = 7 * 24
+
+
+class PollScheduler:
+    """Pick the delay before the next scrape from recent changes and posting history.
+
+    The interval grows exponentially while the page stays unchanged and snaps back to
+    the minimum after a change. Its ceiling is lowered for the hours of the week that
+    new items have been posted in before, so busy hours are never polled slowly.
+    """
+
+    def __init__(
+        self,
+        min_interval: float | None = None,
+        max_interval: float | None = None,
+        backoff: float = 2.0,
+        jitter: float = 0.1,
+    ):
+        self.min_interval = (
+            consts.POLL_MIN_INTERVAL if min_interval is None else min_interval
+        )
+        self.max_interval = (
+            consts.POLL_MAX_INTERVAL if max_interval is None else max_interval
+        )
+        self.backoff = backoff
+        self.jitter = jitter
+
+        self.interval: float = self.min_interval
+        self.unchanged: int = 0
+        self.profile: list[int] = [0] * HOURS_PER_WEEK  # new items per hour of the week
+
+    def seed(self, detected: Iterable[datetime]) -> None:
+        """Add items detected before this run to the posting profile."""
+        for when in detected:
+            self.profile[self.hour_of_week(when)] += 1
+
+    def hour_of_week(self, when: datetime) -> int:
+        return when.weekday() * 24 + when.hour
+
+    def ceiling(self, when: datetime) -> float:
+        """Longest interval allowed at a time, shorter the busier that hour has been."""
+        busiest = max(self.profile)
+        if busiest == 0:
+            return self.max_interval
+        activity = self.profile[self.hour_of_week(when)] / busiest
+        return self.max_interval - (self.max_interval - self.min_interval) * activity
+
+    def record(self, changed: bool, new_items: int = 0) -> float:
+        """Record the outcome of a scrape and return the delay before the next one."""
+        now = datetime.utcnow()
+        if new_items:
+            self.profile[self.hour_of_week(now)] += new_items
+
+        if changed:
+            self.unchanged = 0
+            self.interval = self.min_interval
+        else:
+            self.unchanged += 1
+            self.interval = max(
+                self.min_interval,
+                min(self.interval * self.backoff, self.ceiling(now)),
+            )
+
+        delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(self.min_interval, min(delay, self.max_interval))
@@ -0,0 +1,101 @@
+"""Scrape worker entry point, runs the scraper in its own process without a gateway.
+
+Set `ipc.socket` in config.json, then start this with `python bot/worker.py` next to the
+bot. The bot connects to the socket and only delivers the diffs published here.
+"""
+
+import argparse
+import asyncio
+import logging
+import signal
+
+from aiohttp import ClientSession
+from exts.scraper import Scrape, Scraper
+from lib import consts
+from lib.db import Database
+from lib.http import HTTPClient, create_session
+from lib.ipc import DiffPublisher, NotDeliveredError
+from lib.log import setup_logging
+
+log = logging.getLogger("primed.worker")
+
+
+class ScrapeWorker(Scraper):
+    """Scraper that publishes its diffs to the bot instead of notifying subscribers.
+
+    A diff the bot doesn't ack is handled like a failed outbox write, its items aren't
+    marked seen and the next cycle publishes them again.
+    """
+
+    def __init__(self, host: "Worker", publisher: DiffPublisher):
+        super().__init__(host)  # type: ignore
+        self.publisher = publisher
+        self.database_errors += (NotDeliveredError,)
+
+    async def cog_load(self) -> None:
+        await self.seen.load()
+        log.info("loaded %d seen items", len(self.seen))
+        self.scheduler.seed(await self.seen.detected_times())
+
+    async def notify(self, new_data: Scrape) -> None:
+        await self.publisher.publish(self.dump_scrape(new_data))
+
+    async def update_presence(self) -> None:
+        pass  # no gateway connection, the bot sets its own presence
+
+
+class Worker:
+    """Owns what the scraper needs from `Primed`: the http client and the database."""
+
+    def __init__(self, path: str, mock_webpage: bool = False):
+        self.db: Database | None = None
+        self.publisher = DiffPublisher(path)
+        self.mock_webpage = mock_webpage
+
+    async def run(self) -> None:
+        self.session: ClientSession = create_session()
+        self.http_client = HTTPClient(self.session)
+        if consts.MONGODB_HOST is not None:
+            self.db = Database(self)  # type: ignore
+        await self.publisher.start()
+
+        scraper = ScrapeWorker(self, self.publisher)
+        scraper.mock_webpage = self.mock_webpage
+        await scraper.cog_load()
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        scraper.scrape.start()
+        log.info("scrape worker started")
+        try:
+            await stop.wait()
+        finally:
+            log.info("scrape worker stopping")
+            scraper.scrape.cancel()
+            await scraper.cog_unload()
+            await self.publisher.close()
+            await self.session.close()
+            if self.db is not None:
+                await self.db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--socket", default=consts.IPC_SOCKET, help="unix socket to publish on"
+    )
+    parser.add_argument(
+        "--mock",
+        action="store_true",
+        help="scrape webpages/sample.html instead of hsqb",
+    )
+    args = parser.parse_args()
+    if args.socket is None:
+        parser.error("no socket, set ipc.socket in config.json or pass --socket")
+
+    listener = setup_logging()
+    asyncio.run(Worker(args.socket, args.mock).run())
+    listener.stop()
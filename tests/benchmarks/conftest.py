@@ -0,0 +1,69 @@
+import asyncio
+from unittest import mock
+
+import pytest
+from exts.scraper import Scraper
+from lib.db import Database, User
+
+
+@pytest.fixture
+def run():
+    """Run coroutines from synchronous benchmarks, all on one event loop."""
+    with asyncio.Runner() as runner:
+        yield runner.run
+
+
+@pytest.fixture
+def synthetic_page():
+    def build(tournaments: int, reports: int = 3, sets: int | None = None) -> str:
+        """Build a front page with the markup hsqb uses for recent stats and sets."""
+        stats_html = "".join(
+            f'<li><span class="Tournament"><a href="Tournaments/{i}/">Tournament {i}</a>'
+            '</span><ul class="Reports">'
+            + "".join(
+                f'<li><a href="Tournaments/{i}/Stats/{j}/">Report {j}</a></li>'
+                for j in range(reports)
+            )
+            + "</ul></li>"
+            for i in range(tournaments)
+        )
+        sets_html = "".join(
+            f'<li><span class="Name"><a href="QuestionSets/{i}/">Set {i}</a></span></li>'
+            for i in range(tournaments if sets is None else sets)
+        )
+        filler = "<div><p>news <b>and</b> forum posts</p></div>" * tournaments
+        return (
+            f"<html><body>{filler}"
+            f'<div id="RecentStats"><ul class="Tournaments">{stats_html}</ul></div>'
+            f'<div id="RecentlyPostedSets"><ul class="NoHeader">{sets_html}</ul></div>'
+            f"{filler}</body></html>"
+        )
+
+    return build
+
+
+@pytest.fixture
+def bench_scraper(run):
+    scraper = Scraper(mock.MagicMock(db=None))
+    yield scraper
+    run(scraper.cog_unload())
+
+
+@pytest.fixture
+def users():
+    """How many users `bench_database` is seeded with."""
+    return 1000
+
+
+@pytest.fixture
+def bench_database(run, mongomock_motor, users):
+    """A database with `users` users, every third one on digests."""
+    database = Database(mock.MagicMock())
+    run(database.create_indexes())
+    for i in range(users):
+        user = User(
+            i, f"user{i}", f"User {i}", False, False, 10**6 + i, digest=i % 3 == 0
+        )
+        run(database.add_user(user))
+    yield database
+    run(database.close())
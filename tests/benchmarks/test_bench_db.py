@@ -0,0 +1,53 @@
+from datetime import datetime
+
+ENTRIES = 200
+
+
+def test_user_exists(benchmark, run, bench_database, users):
+    assert benchmark(lambda: run(bench_database.user_exists(users // 2)))
+
+
+def test_get_preferences(benchmark, run, bench_database, users):
+    assert benchmark(lambda: run(bench_database.get_preferences(users // 2)))
+
+
+def test_get_all_users(benchmark, run, bench_database, users):
+    assert len(benchmark(lambda: run(bench_database.get_all_users()))) == users
+
+
+def test_add_seen_links(benchmark, run, bench_database):
+    links = [f"https://hsquizbowl.org/db/QuestionSets/{i}/" for i in range(100)]
+
+    benchmark(lambda: run(bench_database.add_seen_links(links)))
+
+
+def test_enqueue_notifications(benchmark, run, bench_database):
+    now = datetime.utcnow()
+    entries = [
+        {
+            "_id": f"{channel_id}:set",
+            "key": "set",
+            "channel_id": channel_id,
+            "item": {"set": ["Set", "set"]},
+            "detected": now,
+            "digest": False,
+        }
+        for channel_id in range(ENTRIES)
+    ]
+
+    benchmark(lambda: run(bench_database.enqueue_notifications(entries)))
+
+
+def test_get_pending_notifications(benchmark, run, bench_database, users):
+    now = datetime.utcnow()
+    run(
+        bench_database.enqueue_notifications(
+            {"_id": str(i), "key": "set", "channel_id": i, "item": {}, "detected": now}
+            for i in range(users)
+        )
+    )
+
+    assert (
+        len(benchmark(lambda: run(bench_database.get_pending_notifications(100))))
+        == 100
+    )
@@ -0,0 +1,74 @@
+import json
+from datetime import datetime
+from unittest import mock
+
+import discord
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from lib.notify import Delivery, Notifier, RenderedEmbed
+
+DELIVERIES = 1000
+
+USER = {"id": "1", "username": "primed", "discriminator": "0", "avatar": None}
+
+
+def json_response(data: dict) -> web.Response:
+    # discord.py only decodes bodies whose content type is exactly application/json
+    return web.Response(body=json.dumps(data).encode(), content_type="application/json")
+
+
+def message(channel_id: str) -> dict:
+    """The fields discord.py needs to build a `Message` from a send."""
+    return {
+        "id": "2",
+        "channel_id": channel_id,
+        "author": USER,
+        "content": "",
+        "timestamp": "2024-01-01T00:00:00+00:00",
+        "edited_timestamp": None,
+        "tts": False,
+        "mention_everyone": False,
+        "mentions": [],
+        "mention_roles": [],
+        "attachments": [],
+        "embeds": [],
+        "pinned": False,
+        "type": 0,
+    }
+
+
+@pytest.fixture
+def discord_client(run):
+    """A `discord.Client` logged in to a local server that fakes Discord's HTTP API."""
+
+    async def me(request):
+        return json_response(USER)
+
+    async def send(request):
+        await request.read()
+        return json_response(message(request.match_info["channel_id"]))
+
+    app = web.Application()
+    app.router.add_get("/api/v10/users/@me", me)
+    app.router.add_post("/api/v10/channels/{channel_id}/messages", send)
+    server = TestServer(app)
+    run(server.start_server())
+    client = discord.Client(intents=discord.Intents.none())
+    with mock.patch.object(
+        discord.http.Route, "BASE", str(server.make_url("/api/v10"))
+    ):
+        run(client.http.static_login("token"))
+        yield client
+        run(client.http.close())
+    run(server.close())
+
+
+def test_fan_out(benchmark, run, discord_client):
+    notifier = Notifier(discord_client, concurrency=16, retries=0)
+    embeds = [RenderedEmbed.render(discord.Embed(title="New set: Set", url="set"))]
+    deliveries = [(channel_id, embeds) for channel_id in range(DELIVERIES)]
+
+    results = benchmark(lambda: run(notifier.fan_out(deliveries, datetime.utcnow())))
+
+    assert all(result is Delivery.SENT for result in results)
@@ -0,0 +1,31 @@
+import pytest
+from lib.parse import STATS_ID, section_html
+
+SIZES = (10, 100, 1000)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_section_html(benchmark, synthetic_page, size):
+    html = synthetic_page(size)
+
+    assert benchmark(section_html, html, STATS_ID) is not None
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_parse_page(benchmark, run, bench_scraper, synthetic_page, size):
+    html = synthetic_page(size)
+
+    scrape = benchmark(lambda: run(bench_scraper.parse_page(html, None)))
+
+    assert len(scrape.stats) == size
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_get_new(benchmark, run, bench_scraper, synthetic_page, size):
+    old = run(bench_scraper.parse_page(synthetic_page(size - size // 10), None))
+    new = run(bench_scraper.parse_page(synthetic_page(size), None))
+    bench_scraper.seen.links = set(bench_scraper.scrape_links(old))
+
+    diff = benchmark(lambda: run(bench_scraper.get_new(new)))
+
+    assert len(diff.stats) == size // 10
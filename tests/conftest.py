@@ -0,0 +1,66 @@
+import os
+import shutil
+from unittest import mock
+
+import mongomock.collection
+import pytest
+from exts.scraper import Scraper
+from lib.db import Database
+from mongomock_motor import AsyncMongoMockClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True, scope="session")
+def workdir(tmp_path_factory):
+    """Run from a scratch directory so config.json and seen.db don't land in the repo."""
+    path = tmp_path_factory.mktemp("primed")
+    shutil.copy(os.path.join(ROOT, "config_default.json"), path)
+    cwd = os.getcwd()
+    os.chdir(path)
+    yield path
+    os.chdir(cwd)
+
+
+@pytest.fixture
+async def scraper():
+    bot = mock.MagicMock(db=None)
+    bot.change_presence = mock.AsyncMock()
+    scraper = Scraper(bot)
+    yield scraper
+    await scraper.cog_unload()
+
+
+@pytest.fixture
+def discord_users():
+    """Users the stub discord client knows, by id."""
+    return {}
+
+
+@pytest.fixture
+def mongomock_motor(monkeypatch):
+    """Make `Database` connect to an in-memory mongomock client."""
+    # newer pymongo passes a sort argument to bulk writes that mongomock doesn't take
+    builder = mongomock.collection.BulkOperationBuilder
+    for name in ("add_update", "add_replace"):
+        add = getattr(builder, name)
+        monkeypatch.setattr(
+            builder,
+            name,
+            lambda self, *args, sort=None, add=add, **kwargs: add(
+                self, *args, **kwargs
+            ),
+        )
+    monkeypatch.setattr(
+        "motor.motor_asyncio.AsyncIOMotorClient", lambda uri: AsyncMongoMockClient()
+    )
+
+
+@pytest.fixture
+async def database(mongomock_motor, discord_users):
+    discord_client = mock.MagicMock()
+    discord_client.get_user = discord_users.get
+    database = Database(discord_client)
+    await database.create_indexes()
+    yield database
+    await database.close()
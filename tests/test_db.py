@@ -0,0 +1,132 @@
+import asyncio
+import sqlite3
+from contextlib import closing
+from unittest import mock
+
+import pytest
+from lib.db import Database, DuplicateUserError, SeenItems, User
+from lib.poll import PollScheduler
+from pymongo.errors import AutoReconnect
+
+
+class DiscordUser:
+    def __init__(self, id: int, name: str):
+        self.id = id
+        self.name = name
+        self.global_name = name
+        self.bot = False
+        self.system = False
+        self.dm_channel = None
+
+
+def user(id, name, digest=False):
+    return User(id, name, name, False, False, 100 + id, digest=digest)
+
+
+async def test_regenerate_keeps_preferences(database, discord_users):
+    await database.add_user(user(1, "same", digest=True))
+    await database.add_user(user(2, "old", digest=True))
+    discord_users[1] = DiscordUser(1, "same")
+    discord_users[2] = DiscordUser(2, "new")
+
+    await database.regenerate_all_users(chunk_size=1)
+
+    first, second = await database.get_user(1), await database.get_user(2)
+    assert first.digest and second.digest
+    assert second.username == "new"
+    assert {101, 102} <= database.subscribers.digest
+
+
+async def test_regenerate_user_keeps_preferences(database, discord_users):
+    await database.add_user(
+        User(1, "old", "old", False, False, 101, stats=False, digest=True)
+    )
+    discord_users[1] = DiscordUser(1, "new")
+
+    await database.regenerate_user(1)
+
+    regenerated = await database.get_user(1)
+    assert regenerated.username == "new"
+    assert (regenerated.stats, regenerated.sets, regenerated.digest) == (
+        False,
+        True,
+        True,
+    )
+    assert regenerated.dm_channel_id == 101
+
+
+async def test_duplicates_are_removed_to_build_the_unique_index(mongomock_motor):
+    database = Database(mock.MagicMock())
+    for _ in range(2):
+        await database.users.insert_one(await user(1, "dup").to_mongo_doc())
+
+    await database.create_indexes()
+
+    with pytest.raises(DuplicateUserError):
+        await database.add_user(user(1, "dup"))
+    assert await database.users.count_documents({"discord.id": 1}) == 1
+    await database.close()
+
+
+class ChangeStream:
+    """Replays change events, then fails with `error` or waits for more."""
+
+    def __init__(self, changes, error=None):
+        self.changes = changes
+        self.error = error
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def __aiter__(self):
+        for change in self.changes:
+            yield change
+        if self.error is not None:
+            raise self.error
+        await asyncio.Event().wait()
+
+
+async def test_watch_removes_deleted_users_and_survives_errors(database, monkeypatch):
+    doc = {"_id": "a", **await user(1, "u").to_mongo_doc()}
+    streams = iter(
+        [
+            ChangeStream(
+                [{"operationType": "insert", "fullDocument": doc}],
+                AutoReconnect("connection reset"),
+            ),
+            ChangeStream([{"operationType": "delete", "documentKey": {"_id": "a"}}]),
+        ]
+    )
+    monkeypatch.setattr(database.users, "watch", lambda **kwargs: next(streams))
+    load = mock.AsyncMock()
+    monkeypatch.setattr(database, "load_subscribers", load)
+
+    task = asyncio.create_task(database.watch_subscribers(retry=0))
+    for _ in range(10):
+        await asyncio.sleep(0)
+    task.cancel()
+
+    assert load.await_count == 1  # on reopening, not on the delete
+    assert len(database.subscribers) == 0
+    assert not database.subscribers.discord_ids
+
+
+async def test_poll_profile_is_seeded_from_detection_times(tmp_path, database):
+    path = tmp_path / "seen.db"
+    with closing(sqlite3.connect(path)) as conn, conn:
+        conn.execute("CREATE TABLE seen (link TEXT PRIMARY KEY)")  # before seen_at
+        conn.execute("INSERT INTO seen VALUES ('old')")
+
+    for seen in (SeenItems(path=str(path)), SeenItems(database)):
+        await seen.add(["a", "b"])  # the first scrape
+        await asyncio.sleep(0.01)  # mongodb keeps milliseconds
+        await seen.add(["c"])
+        times = await seen.detected_times()
+        assert len(times) == 1
+
+        scheduler = PollScheduler(min_interval=20, max_interval=300)
+        scheduler.seed(times)
+        assert scheduler.ceiling(times[0]) == 20
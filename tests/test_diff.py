@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from exts.scraper import Scrape
+from lib.consts import HSQB
+
+
+def tournament(i, reports):
+    return (
+        f"T {i}",
+        f"{HSQB}Tournaments/{i}/",
+        tuple((f"R{j}", f"{HSQB}Tournaments/{i}/Stats/{j}/") for j in reports),
+    )
+
+
+def set_row(i):
+    return (f"S {i}", f"{HSQB}QuestionSets/{i}/")
+
+
+def make_scrape(scraper, stats, sets):
+    return Scrape(
+        stats=scraper.build_stats(stats),
+        sets=scraper.build_sets(sets),
+        timestamp=datetime.utcnow(),
+    )
+
+
+async def seed(scraper, scrape):
+    await scraper.seen.add(scraper.scrape_links(scrape))
+    scraper.cache = scrape
+
+
+async def test_nothing_seen_returns_none(scraper):
+    scrape = make_scrape(scraper, [tournament(0, [0])], [set_row(0)])
+
+    assert await scraper.get_new(scrape) is None
+
+
+async def test_reordered_page_has_nothing_new(scraper):
+    stats = [tournament(i, [0, 1]) for i in range(3)]
+    sets = [set_row(i) for i in range(3)]
+    await seed(scraper, make_scrape(scraper, stats, sets))
+
+    new = await scraper.get_new(make_scrape(scraper, stats[::-1], sets[::-1]))
+
+    assert new is not None
+    assert new.stats == ()
+    assert new.sets == ()
+
+
+async def test_known_tournament_only_returns_new_report(scraper):
+    await seed(scraper, make_scrape(scraper, [tournament(0, [0])], []))
+
+    new = await scraper.get_new(make_scrape(scraper, [tournament(0, [0, 1])], []))
+
+    assert new is not None
+    assert [t.tournament_link for t in new.stats] == [f"{HSQB}Tournaments/0/"]
+    assert [sr.name for sr in new.stats[0].stat_reports] == ["R1"]
+    assert new.sets == ()
+
+
+async def test_new_set(scraper):
+    await seed(scraper, make_scrape(scraper, [tournament(0, [0])], [set_row(0)]))
+
+    new = await scraper.get_new(
+        make_scrape(scraper, [tournament(0, [0])], [set_row(1), set_row(0)])
+    )
+
+    assert new is not None
+    assert new.stats == ()
+    assert [set.name for set in new.sets] == ["S 1"]
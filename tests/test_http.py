@@ -0,0 +1,50 @@
+import pytest
+from aiohttp import ClientResponseError, ClientSession, web
+from aiohttp.test_utils import TestServer
+from lib.http import HTTPClient
+
+
+@pytest.fixture
+async def server():
+    hits = {"missing": 0, "flaky": 0}
+
+    async def missing(request):
+        hits["missing"] += 1
+        raise web.HTTPNotFound()
+
+    async def flaky(request):
+        hits["flaky"] += 1
+        if hits["flaky"] == 1:
+            raise web.HTTPServiceUnavailable()
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_get("/missing", missing)
+    app.router.add_get("/flaky", flaky)
+    async with TestServer(app) as server:
+        server.hits = hits
+        yield server
+
+
+@pytest.fixture
+async def client():
+    async with ClientSession() as session:
+        yield HTTPClient(session, retries=2, breaker_threshold=1)
+
+
+async def test_4xx_is_not_retried(server, client):
+    with pytest.raises(ClientResponseError):
+        await client.get(str(server.make_url("/missing")))
+
+    assert server.hits["missing"] == 1
+    assert client.failures == 0
+    assert not client.circuit_open
+
+
+async def test_5xx_is_retried(server, client, monkeypatch):
+    monkeypatch.setattr("lib.http.random.uniform", lambda a, b: 0)
+
+    response = await client.get(str(server.make_url("/flaky")))
+
+    assert response.text == "ok"
+    assert server.hits["flaky"] == 2
@@ -0,0 +1,75 @@
+import asyncio
+from unittest import mock
+
+from exts.scraper import ScrapeRelay
+from lib.consts import HSQB
+from lib.db import User
+from lib.ipc import DiffPublisher
+from worker import ScrapeWorker
+
+
+def page(sets: int) -> str:
+    return (
+        '<div id="RecentStats"><ul class="Tournaments"></ul></div>'
+        '<div id="RecentlyPostedSets"><ul class="NoHeader">'
+        + "".join(
+            f'<li><span class="Name"><a href="QuestionSets/{i}/">S {i}</a></span></li>'
+            for i in range(sets)
+        )
+        + "</ul></div>"
+    )
+
+
+async def test_worker_diffs_reach_the_outbox(tmp_path, monkeypatch, database):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "webpages").mkdir()
+    sample = tmp_path / "webpages" / "sample.html"
+    path = str(tmp_path / "primed.sock")
+
+    publisher = DiffPublisher(path, timeout=5)
+    await publisher.start()
+    worker = ScrapeWorker(mock.MagicMock(db=None), publisher)
+    worker.mock_webpage = True
+    await worker.cog_load()
+
+    await database.add_user(User(1, "u", "u", False, False, 100))
+    database.subscribers_loaded = True
+    relay = ScrapeRelay(mock.MagicMock(db=database), path=path)
+
+    async def connect() -> asyncio.Task:
+        task = asyncio.create_task(relay.relay(retry=0.01))
+        while not publisher.writers:
+            await asyncio.sleep(0.01)
+        return task
+
+    async def queued() -> set:
+        return {entry["key"] async for entry in database.outbox.find()}
+
+    sample.write_text(page(1))
+    await worker.scrape.coro(worker)  # first scrape sets the baseline
+    task = await connect()
+
+    sample.write_text(page(2))
+    await worker.scrape.coro(worker)
+
+    assert await queued() == {f"{HSQB}QuestionSets/1/"}
+    assert f"{HSQB}QuestionSets/1/" in worker.seen
+
+    # while the bot is down the new set stays unseen, and is sent once it's back
+    task.cancel()
+    while publisher.writers:
+        await asyncio.sleep(0.01)
+    sample.write_text(page(3))
+    await worker.scrape.coro(worker)
+    assert f"{HSQB}QuestionSets/2/" not in worker.seen
+
+    task = await connect()
+    await worker.scrape.coro(worker)
+
+    assert f"{HSQB}QuestionSets/2/" in await queued()
+    assert f"{HSQB}QuestionSets/2/" in worker.seen
+
+    task.cancel()
+    await relay.cog_unload()
+    await worker.cog_unload()
+    await publisher.close()
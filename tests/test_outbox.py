@@ -0,0 +1,79 @@
+from collections import defaultdict
+from datetime import datetime
+from unittest import mock
+
+import aiohttp
+import discord
+from exts.scraper import Scrape, Scraper, Set
+from lib.db import User
+from lib.notify import Delivery, Notifier
+
+
+async def test_digest_burst_spanning_batches(database):
+    for i in range(60):
+        await database.add_user(
+            User(i, f"u{i}", f"u{i}", False, False, i, digest=i == 59)
+        )
+    database.subscribers_loaded = True
+    scraper = Scraper(mock.MagicMock(db=database))
+    scraper.outbox.batch_size = 100
+    sent = defaultdict(list)
+
+    async def send(channel_id, embeds):
+        sent[channel_id].append(len(embeds))
+        return Delivery.SENT
+
+    scraper.notifier.send = send
+    sets = [Set(f"S {i}", f"QuestionSets/{i}/") for i in range(3)]
+
+    await scraper.notify(Scrape([], sets, datetime.utcnow()))
+    await scraper.outbox.drain()
+
+    assert sent[59] == [3]
+    assert all(sent[i] == [1, 1, 1] for i in range(59))
+    assert await database.get_pending_notifications() == []
+    await scraper.cog_unload()
+
+
+async def test_transient_failures_are_retried(database):
+    for i in range(2):
+        await database.add_user(User(i, f"u{i}", f"u{i}", False, False, i))
+    database.subscribers_loaded = True
+    scraper = Scraper(mock.MagicMock(db=database))
+    results = {0: Delivery.RETRY, 1: Delivery.FAILED}
+
+    async def send(channel_id, embeds):
+        return results[channel_id]
+
+    scraper.notifier.send = send
+
+    await scraper.notify(Scrape([], [Set("S", "QuestionSets/0/")], datetime.utcnow()))
+    await scraper.outbox.drain()
+
+    entries = {entry["channel_id"]: entry async for entry in database.outbox.find()}
+    assert not entries[0]["sent"]
+    assert entries[0]["attempts"] == 1
+    assert entries[0]["not_before"] > datetime.utcnow()
+    assert entries[1]["sent"] and entries[1]["failed"]
+    assert 0 < scraper.outbox.timeout() <= scraper.outbox.interval
+    await scraper.cog_unload()
+
+
+async def test_send_tells_transient_from_permanent_failures():
+    channel = mock.MagicMock()
+    client = mock.MagicMock()
+    client.get_partial_messageable.return_value = channel
+    notifier = Notifier(client, concurrency=1, retries=0)
+
+    for status, error, delivery in (
+        (503, discord.HTTPException, Delivery.RETRY),
+        (429, discord.HTTPException, Delivery.RETRY),
+        (403, discord.Forbidden, Delivery.FAILED),
+        (404, discord.NotFound, Delivery.FAILED),
+    ):
+        response = mock.Mock(status=status, reason="")
+        channel.send = mock.AsyncMock(side_effect=error(response, ""))
+        assert await notifier.send(1, []) is delivery
+
+    channel.send = mock.AsyncMock(side_effect=aiohttp.ClientConnectionError())
+    assert await notifier.send(1, []) is Delivery.RETRY
@@ -0,0 +1,40 @@
+from lib.parse import STATS_ID, section_html
+
+
+def test_section_html_slices_nested_divs():
+    html = '<div id="RecentStats"><div>a</div><div>b</div></div><div>after</div>'
+
+    assert section_html(html, STATS_ID) == (
+        '<div id="RecentStats"><div>a</div><div>b</div></div>'
+    )
+
+
+def test_section_html_matches_whole_id():
+    html = (
+        '<div id="RecentStats-old"><p>old</p></div>'
+        '<div data-id="RecentStats"><p>data</p></div>'
+        "<div class='x' id='RecentStats'><p>new</p></div>"
+    )
+
+    assert section_html(html, STATS_ID) == (
+        "<div class='x' id='RecentStats'><p>new</p></div>"
+    )
+
+
+def test_section_html_unquoted_id():
+    assert section_html("<div id=RecentStats>x</div>", STATS_ID) == (
+        "<div id=RecentStats>x</div>"
+    )
+
+
+def test_section_html_missing():
+    assert section_html('<div id="RecentStatsOld">x</div>', STATS_ID) is None
+
+
+def test_section_html_skips_comments_and_scripts():
+    html = (
+        '<div id="RecentStats"><!-- <div> --><!-- </div> -->'
+        '<script>"</div>"</script><p>x</p></div><div>after</div>'
+    )
+
+    assert section_html(html, STATS_ID) == html[: -len("<div>after</div>")]
@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime
+from unittest import mock
+
+from exts.scraper import Scrape, Scraper, ScrapeRelay, Set
+from lib.consts import HSQB
+from lib.http import Response
+from lib.parse import STATS_ID
+from multidict import CIMultiDict, CIMultiDictProxy
+from pymongo.errors import AutoReconnect
+
+PAGE = (
+    '<div id="RecentStats"><ul class="Tournaments">'
+    '<li><span class="Tournament"><a href="Tournaments/1/">T 1</a></span>'
+    '<ul class="Reports"><li><a href="Tournaments/1/Stats/1/">R1</a></li></ul></li>'
+    "</ul></div>"
+    '<div id="RecentlyPostedSets"><ul class="NoHeader">'
+    '<li><span class="Name"><a href="QuestionSets/1/">S 1</a></span></li>'
+    "</ul></div>"
+)
+
+
+class StubClient:
+    """Serves one page with an ETag, answering 304 when it's sent back."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def get(self, url, headers=None):
+        self.requests.append(dict(headers or {}))
+        if (headers or {}).get("If-None-Match") == '"v1"':
+            return Response(304, CIMultiDictProxy(CIMultiDict()), "")
+        return Response(200, CIMultiDictProxy(CIMultiDict(ETag='"v1"')), PAGE)
+
+
+async def test_parse_timeout_refetches_page(scraper):
+    scraper.bot.http_client = StubClient()
+    parse_page = scraper.parse_page
+
+    async def time_out(html, timestamp):
+        scraper.parse_page = parse_page
+        raise asyncio.TimeoutError
+
+    scraper.parse_page = time_out
+    await scraper.scrape.coro(scraper)
+    assert scraper.cache is None
+
+    await scraper.scrape.coro(scraper)
+
+    assert "If-None-Match" not in scraper.bot.http_client.requests[1]
+    assert scraper.cache is not None
+    assert [set.name for set in scraper.cache.sets] == ["S 1"]
+
+
+async def test_database_error_keeps_loop_running(database):
+    scraper = Scraper(mock.MagicMock(db=database, http_client=StubClient()))
+    scraper.bot.change_presence = mock.AsyncMock()
+    add = scraper.seen.add
+
+    async def fail(links):
+        scraper.seen.add = add
+        raise AutoReconnect("connection reset")
+
+    scraper.seen.add = fail
+    await scraper.scrape.coro(scraper)
+    assert scraper.cache is None
+    assert scraper.page_hash is None
+
+    await scraper.scrape.coro(scraper)
+
+    assert scraper.cache is not None
+    assert f"{HSQB}QuestionSets/1/" in scraper.seen
+    await scraper.cog_unload()
+
+
+async def test_relay_retries_database_errors(database, monkeypatch):
+    relay = ScrapeRelay(mock.MagicMock(db=database), path="unused")
+    diff = Scrape([], [Set("S 1", f"{HSQB}QuestionSets/1/")], datetime.utcnow())
+    message = relay.dump_scrape(diff)
+
+    async def subscribe(path):
+        yield message
+
+    monkeypatch.setattr("exts.scraper.subscribe", subscribe)
+    notified = []
+
+    async def notify(new_data):
+        if not notified:
+            notified.append(None)
+            raise AutoReconnect("connection reset")
+        notified.append(new_data)
+
+    relay.notify = notify
+
+    await relay.relay(retry=0)
+
+    assert [set.link for set in notified[1].sets] == [f"{HSQB}QuestionSets/1/"]
+    await relay.cog_unload()
+
+
+async def test_unexpected_section_markup_falls_back_to_full_parse(scraper):
+    scraper.cache = Scrape([], [], datetime.utcnow())
+    sections = {STATS_ID: '<div id="RecentStats"><p>cut short</p></div>'}
+
+    scrape = await scraper.parse_sections(PAGE, sections, {STATS_ID}, datetime.utcnow())
+
+    assert [tournament.tournament_name for tournament in scrape.stats] == ["T 1"]
+    assert [set.name for set in scrape.sets] == ["S 1"]